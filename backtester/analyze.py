@@ -1,6 +1,46 @@
+import numpy as np
 import pandas as pd
 
-def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_time="16:00"):
+# Columns of the per-unit trade event record returned under stats["events"]
+TRADE_EVENT_COLUMNS = ("time", "event", "price", "stop", "pnl", "risk", "rr")
+
+
+def new_trade_events():
+    return {column: [] for column in TRADE_EVENT_COLUMNS}
+
+
+def record_trade_event(events, time, event, price, stop, pnl=None, risk=None, rr=None):
+    # time is int64 ns (naive ET). For TRAIL, price is the old stop and stop the new one.
+    events["time"].append(time)
+    events["event"].append(event)
+    events["price"].append(price)
+    events["stop"].append(stop)
+    events["pnl"].append(pnl)
+    events["risk"].append(risk)
+    events["rr"].append(rr)
+
+
+def format_trade_log(events):
+    # Renders the text log shown next to the raw bars (EOD exits were never logged)
+    lines = []
+    entry_price = None
+    for time, event, price, stop, pnl, risk, rr in zip(*(events[column] for column in TRADE_EVENT_COLUMNS)):
+        stamp = pd.Timestamp(time)
+        if event == "ENTER":
+            entry_price = price
+            lines.append(f"[{stamp}] ENTER SHORT @ {price:.2f} | Initial Stop: {stop:.2f}")
+        elif event == "TRAIL":
+            lines.append(f"[{stamp}] TRAIL STOP adjusted: {price:.2f} → {stop:.2f}")
+        elif event == "EXIT":
+            percent_return = (pnl / entry_price) * 100
+            lines.append(f"[{stamp}] EXIT SHORT @ {price:.2f}")
+            lines.append(f"P&L: {pnl:.2f} | % Return: {percent_return:.2f}% | Risk: {risk:.2f} | Reward: {pnl:.2f} | R/R: {rr:.2f}")
+            lines.append("")
+    return lines
+
+
+def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_time="16:00", capitulation_threshold=0.10,
+                                                  session_start="04:00", session_end="20:00"):
     position = None
     entry_price = None
     stop_price = None
@@ -17,8 +57,9 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
     num_trades = 0
     ev_risk_ratios = []
     unitsRisked = 0
+    events = new_trade_events()
 
-    df_filtered = df.between_time("04:00", "20:00")
+    df_filtered = df.between_time(session_start, session_end)
     times = df_filtered.index
     
     #just added
@@ -50,12 +91,12 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
                 stop_price = high_of_day
                 position = "short"
                 num_trades += 1
-                print(f"[{curr_time}] ENTER SHORT @ {entry_price:.2f} | Initial Stop: {stop_price:.2f}")
+                record_trade_event(events, curr_time.value, "ENTER", entry_price, stop_price)
 
         elif position == "short":
             trailing_stop = prev["high"]
             if trailing_stop < stop_price:
-                print(f"[{curr_time}] TRAIL STOP adjusted: {stop_price:.2f} → {trailing_stop:.2f}")
+                record_trade_event(events, curr_time.value, "TRAIL", stop_price, trailing_stop)
                 stop_price = trailing_stop
 
             if curr["high"] >= stop_price:
@@ -69,8 +110,7 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
                 unitsRisked += risk
 
 
-                print(f"[{curr_time}] EXIT SHORT @ {exit_price:.2f}")
-                print(f"P&L: {pnl:.2f} | % Return: {percent_return:.2f}% | Risk: {risk:.2f} | Reward: {reward:.2f} | R/R: {rr_ratio:.2f}\n")
+                record_trade_event(events, curr_time.value, "EXIT", exit_price, stop_price, pnl, risk, rr_ratio)
 
                 total_pnl += pnl
                 total_percent_return += percent_return
@@ -87,9 +127,9 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
                 risk_reward_ratios.append(rr_ratio)
                 position = None
 
-                # NEW: Check if move from high of day to exit was ≥10%
+                # NEW: Check if move from high of day to exit was ≥10% (capitulation_threshold)
                 drop_from_high = (high_of_day - exit_price) / high_of_day
-                if drop_from_high >= 0.10:
+                if drop_from_high >= capitulation_threshold:
                     capitulation_occurred = True
 
     if position == "short":
@@ -103,8 +143,7 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
         unitsRisked += risk
 
 
-        #print(f"[{df_filtered.index[-1]}] EOD EXIT SHORT @ {final_close:.2f}")
-        #print(f"P&L: {pnl:.2f} | % Return: {percent_return:.2f}% | Risk: {risk:.2f} | Reward: {reward:.2f} | R/R: {rr_ratio:.2f}\n")
+        record_trade_event(events, df_filtered.index[-1].value, "EOD_EXIT", final_close, stop_price, pnl, risk, rr_ratio)
 
         total_pnl += pnl
         total_percent_return += percent_return
@@ -148,5 +187,316 @@ def run_capitulation_short_strategy_with_metrics(df, start_time="09:30", end_tim
         "min_pnl": round(min_pnl, 2),
         "total_percent_return": round(total_percent_return, 2),
         "avg_percent_return": round(avg_percent_return, 2),
-        "ev_risk": round(ev_risk, 4)
-    }
\ No newline at end of file
+        "ev_risk": round(ev_risk, 4),
+        "events": events
+    }
+
+NS_PER_DAY = 86_400_000_000_000
+
+# "bar" fills entries and stops at bar prices; "tick" replays the unit's
+# trades inside each bar (see run_trailing_stop_strategy)
+FILL_MODES = ("bar", "tick")
+# Tick arrays carried next to the bar arrays of a unit in tick fill mode
+TICK_FIELDS = ("tick_time", "tick_price")
+
+
+def bars_to_arrays(df):
+    # Plain NumPy columns for the array engine; time is int64 ns (naive ET)
+    return {
+        "time": df.index.values.astype("datetime64[ns]").view("int64"),
+        "open": df["open"].to_numpy(dtype="float64"),
+        "high": df["high"].to_numpy(dtype="float64"),
+        "low": df["low"].to_numpy(dtype="float64"),
+        "close": df["close"].to_numpy(dtype="float64"),
+        "volume": df["volume"].to_numpy(dtype="float64"),
+    }
+
+
+def tick_fill_arrays(ticks):
+    # Cleaned trades of a ticker/date -> the tick arrays added to its bar arrays.
+    # Prices are rounded like the bars, so every bar's high/low is a tick price.
+    return {"tick_time": ticks["time"], "tick_price": ticks["price"].round(2)}
+
+
+def _time_of_day_ns(value):
+    t = pd.to_datetime(value).time()
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000_000 + t.microsecond * 1000
+
+
+def run_capitulation_short_strategy_vectorized(df, start_time="09:30", end_time="16:00", **params):
+    return run_capitulation_short_strategy_arrays(bars_to_arrays(df), start_time, end_time, **params)
+
+
+def compute_bar_features(bars, session_start="04:00", session_end="20:00"):
+    # Per-unit features shared by every array strategy (see strategies.py):
+    # the session slice of the bars, running high/low of day and the prior
+    # bar's high/low. Computed once per unit, read by each strategy run.
+    # Bars carrying tick arrays (tick_fill_arrays) also get each bar's tick
+    # range, which switches the strategies to tick fills.
+    time_of_day = np.mod(bars["time"], NS_PER_DAY)
+    session = (time_of_day >= _time_of_day_ns(session_start)) & (time_of_day <= _time_of_day_ns(session_end))
+    high = bars["high"][session]
+    low = bars["low"][session]
+    n = len(high)
+
+    # high_of_day[i] == max(high[1..i]) and low_of_day[i] == min(low[1..i]);
+    # the first bar is never counted
+    high_of_day = np.maximum.accumulate(np.concatenate(([-np.inf], high[1:]))) if n else high
+    low_of_day = np.minimum.accumulate(np.concatenate(([np.inf], low[1:]))) if n else low
+    breaks_low = np.zeros(n, dtype=bool)
+    breaks_low[1:] = low[1:] < low[:-1]
+    breaks_high = np.zeros(n, dtype=bool)
+    breaks_high[1:] = high[1:] > high[:-1]
+
+    features = {
+        "n": n,
+        "times": bars["time"][session],
+        "time_of_day": time_of_day[session],
+        "close": bars["close"][session],
+        "breaks_low": breaks_low,
+        "breaks_high": breaks_high,
+        # Python lists for the bar-by-bar stop walk (prev bar = index i - 1)
+        "high": high.tolist(),
+        "low": low.tolist(),
+        "high_of_day": high_of_day.tolist(),
+        "low_of_day": low_of_day.tolist(),
+        "_windows": {},
+    }
+    if "tick_time" in bars:
+        # Bars are only built where there are ticks, so a bar holds the ticks
+        # from its open up to the next bar's open
+        tick_start = np.searchsorted(bars["tick_time"], bars["time"])
+        tick_end = np.append(tick_start[1:], len(bars["tick_time"]))
+        features["tick_time"] = bars["tick_time"]
+        features["tick_price"] = bars["tick_price"]
+        features["tick_start"] = tick_start[session].tolist()
+        features["tick_end"] = tick_end[session].tolist()
+    return features
+
+
+def entry_window(features, start_time, end_time):
+    # Bars inside the entry window, cached per window on the features
+    key = (start_time, end_time)
+    if key not in features["_windows"]:
+        time_of_day = features["time_of_day"]
+        features["_windows"][key] = (time_of_day >= _time_of_day_ns(start_time)) & (time_of_day <= _time_of_day_ns(end_time))
+    return features["_windows"][key]
+
+
+def run_capitulation_short_strategy_arrays(bars, start_time="09:30", end_time="16:00", capitulation_threshold=0.10,
+                                           session_start="04:00", session_end="20:00"):
+    # Same rules and stats as run_capitulation_short_strategy_with_metrics
+    return run_trailing_stop_strategy(compute_bar_features(bars, session_start, session_end), start_time, end_time,
+                                      capitulation_threshold=capitulation_threshold)
+
+
+def run_trailing_stop_strategy(features, start_time="09:30", end_time="16:00", side="short", trail=True,
+                               capitulation_threshold=0.10):
+    # One position at a time, entered when a bar in the window breaks the
+    # prior bar's low (short, entry at that low, stop at the high of day) or
+    # high (long, entry at that high, stop at the low of day). With trail the
+    # stop follows the prior bar's high (short) / low (long). Entry signals
+    # and the window are precomputed; only the stop state machine is walked
+    # bar by bar. No new entries once an exit is capitulation_threshold away
+    # from the day's extreme.
+    # With tick fills (features built from bars with ticks) the entry and
+    # stop of a signalled bar are replayed on its trades: the entry fills at
+    # the first trade through the prior bar's low/high, the initial stop is
+    # the day's extreme up to that trade, and a stop fills at the first trade
+    # at or through it, including later trades of the entry bar. Trails still
+    # happen at bar opens, and only bars whose high/low reach the stop are
+    # searched.
+    short = side == "short"
+    tick_fills = "tick_price" in features
+    n = features["n"]
+    times = features["times"]
+    close = features["close"]
+    high_l = features["high"]
+    low_l = features["low"]
+    extreme_l = features["high_of_day"] if short else features["low_of_day"]
+    entry_signal = features["breaks_low"] if short else features["breaks_high"]
+    entry_candidates = np.flatnonzero(entry_window(features, start_time, end_time) & entry_signal)
+
+    position = None
+    entry_price = None
+    stop_price = None
+    total_pnl = 0.0
+    total_percent_return = 0.0
+    wins = 0
+    losses = 0
+    risk_reward_ratios = []
+    individual_pnls = []
+    percent_returns = []
+    win_pnls = []
+    loss_pnls = []
+    num_trades = 0
+    unitsRisked = 0
+    capitulation_occurred = False
+    events = new_trade_events()
+    # Tick fills: trade of bar i after the entry, while bar i is the entry bar
+    first_tick = None
+
+    i = 1
+    while i < n:
+        if position is None:
+            if capitulation_occurred:
+                break
+            # Jump straight to the next in-window bar that breaks the prior low/high
+            k = np.searchsorted(entry_candidates, i)
+            if k == len(entry_candidates):
+                break
+            i = int(entry_candidates[k])
+            position = side
+            num_trades += 1
+            if tick_fills:
+                # The rest of the entry bar is checked against the stop next
+                entry_tick, entry_price, stop_price = _tick_entry(features, i, extreme_l[i - 1], short)
+                record_trade_event(events, int(features["tick_time"][entry_tick]), "ENTER", entry_price, stop_price)
+                first_tick = entry_tick + 1
+                continue
+            entry_price = low_l[i - 1] if short else high_l[i - 1]
+            stop_price = extreme_l[i]
+            record_trade_event(events, int(times[i]), "ENTER", entry_price, stop_price)
+            i += 1
+            continue
+
+        if trail and first_tick is None:
+            trailing_stop = high_l[i - 1] if short else low_l[i - 1]
+            if (trailing_stop < stop_price) if short else (trailing_stop > stop_price):
+                record_trade_event(events, int(times[i]), "TRAIL", stop_price, trailing_stop)
+                stop_price = trailing_stop
+
+        # The bar's high/low is one of its trades, so it also screens tick fills
+        stop_hit = (high_l[i] >= stop_price) if short else (low_l[i] <= stop_price)
+        if stop_hit and tick_fills:
+            fill = _tick_stop_fill(features, i, first_tick, extreme_l[i - 1], stop_price, short)
+            stop_hit = fill is not None
+        elif stop_hit:
+            fill = (int(times[i]), stop_price, extreme_l[i])
+        first_tick = None
+
+        if stop_hit:
+            exit_time, exit_price, day_extreme = fill
+            if short:
+                pnl = entry_price - exit_price
+                risk = day_extreme - entry_price
+            else:
+                pnl = exit_price - entry_price
+                risk = entry_price - day_extreme
+            percent_return = (pnl / entry_price) * 100
+            reward = pnl
+            rr_ratio = reward / risk if risk > 0 else 0
+            unitsRisked += risk
+
+            record_trade_event(events, exit_time, "EXIT", exit_price, stop_price, pnl, risk, rr_ratio)
+
+            total_pnl += pnl
+            total_percent_return += percent_return
+            individual_pnls.append(pnl)
+            percent_returns.append(percent_return)
+
+            if pnl > 0:
+                win_pnls.append(pnl)
+                wins += 1
+            else:
+                loss_pnls.append(pnl)
+                losses += 1
+
+            risk_reward_ratios.append(rr_ratio)
+            position = None
+
+            move_from_extreme = (day_extreme - exit_price) / day_extreme if short else (exit_price - day_extreme) / day_extreme
+            if move_from_extreme >= capitulation_threshold:
+                capitulation_occurred = True
+        i += 1
+
+    if position is not None:
+        final_close = float(close[-1])
+        if short:
+            pnl = entry_price - final_close
+            risk = max(stop_price - entry_price, 0.01)
+        else:
+            pnl = final_close - entry_price
+            risk = max(entry_price - stop_price, 0.01)
+        percent_return = (pnl / entry_price) * 100
+        reward = abs(pnl)
+        rr_ratio = reward / risk if risk > 0 else 0
+        unitsRisked += risk
+        exit_time = int(features["tick_time"][features["tick_end"][-1] - 1]) if tick_fills else int(times[-1])
+        record_trade_event(events, exit_time, "EOD_EXIT", final_close, stop_price, pnl, risk, rr_ratio)
+
+        total_pnl += pnl
+        total_percent_return += percent_return
+        individual_pnls.append(pnl)
+        percent_returns.append(percent_return)
+
+        if pnl > 0:
+            win_pnls.append(pnl)
+            wins += 1
+        else:
+            loss_pnls.append(pnl)
+            losses += 1
+
+        risk_reward_ratios.append(rr_ratio)
+
+    win_rate = wins / num_trades if num_trades > 0 else 0
+    loss_rate = losses / num_trades if num_trades > 0 else 0
+    avg_win = sum(win_pnls) / len(win_pnls) if win_pnls else 0
+    avg_loss = sum(loss_pnls) / len(loss_pnls) if loss_pnls else 0
+    expected_value = (win_rate * avg_win) + (loss_rate * avg_loss)
+
+    avg_rr = sum(risk_reward_ratios) / len(risk_reward_ratios) if risk_reward_ratios else 0
+    max_pnl = max(individual_pnls) if individual_pnls else 0
+    min_pnl = min(individual_pnls) if individual_pnls else 0
+    avg_percent_return = sum(percent_returns) / len(percent_returns) if percent_returns else 0
+
+    ev_risk = expected_value / unitsRisked if unitsRisked else 0
+
+    # Price-derived stats are rounded as np.float64 (like the pandas version),
+    # since numpy and Python round differently on exact .xx5 ties.
+    return {
+        "pnl": round(np.float64(total_pnl), 2),
+        "EV": round(np.float64(expected_value), 2),
+        "win_rate": round(win_rate * 100, 2),
+        "avg_risk_reward": round(np.float64(avg_rr), 2),
+        "total_trades": num_trades,
+        "wins": wins,
+        "losses": losses,
+        "max_pnl": round(np.float64(max_pnl), 2),
+        "min_pnl": round(np.float64(min_pnl), 2),
+        "total_percent_return": round(np.float64(total_percent_return), 2),
+        "avg_percent_return": round(np.float64(avg_percent_return), 2),
+        "ev_risk": round(np.float64(ev_risk), 4),
+        "events": events
+    }
+
+
+def _tick_entry(features, i, prior_extreme, short):
+    # First trade of bar i through the prior bar's low (short) / high (long)
+    # -> (tick index, fill price, initial stop = day's extreme up to that trade)
+    start, end = features["tick_start"][i], features["tick_end"][i]
+    prices = features["tick_price"][start:end]
+    if short:
+        offset = int(np.argmax(prices < features["low"][i - 1]))
+        stop = max(prior_extreme, float(prices[:offset + 1].max()))
+    else:
+        offset = int(np.argmax(prices > features["high"][i - 1]))
+        stop = min(prior_extreme, float(prices[:offset + 1].min()))
+    return start + offset, float(prices[offset]), stop
+
+
+def _tick_stop_fill(features, i, first_tick, prior_extreme, stop, short):
+    # First trade of bar i (from first_tick on) at or through the stop
+    # -> (time, fill price, day's extreme up to that trade), or None
+    start, end = features["tick_start"][i], features["tick_end"][i]
+    prices = features["tick_price"][start:end]
+    skip = 0 if first_tick is None else first_tick - start
+    hits = prices[skip:] >= stop if short else prices[skip:] <= stop
+    if not hits.any():
+        return None
+    offset = skip + int(np.argmax(hits))
+    if short:
+        extreme = max(prior_extreme, float(prices[:offset + 1].max()))
+    else:
+        extreme = min(prior_extreme, float(prices[:offset + 1].min()))
+    return int(features["tick_time"][start + offset]), float(prices[offset]), extreme
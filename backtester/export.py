@@ -0,0 +1,350 @@
+import os
+import pandas as pd
+
+from backtester.analyze import format_trade_log
+
+RAW_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+LOG_COLUMN = 6
+
+
+class _Formats:
+    # One xlsxwriter Format per distinct style, created on first use
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._cache = {}
+
+    def get(self, **props):
+        key = tuple(sorted(props.items()))
+        if key not in self._cache:
+            self._cache[key] = self.workbook.add_format(props)
+        return self._cache[key]
+
+
+def _text_lengths(values):
+    # str() per cell: newer pandas keeps NaN as NaN through astype(str)
+    return values.map(lambda value: len(str(value)))
+
+
+def _column_width(values, name):
+    max_len = max(_text_lengths(values).max(), len(name)) + 2
+    return 10 if pd.isna(max_len) else max_len
+
+
+def _cell(value):
+    return "" if pd.isna(value) else value
+
+
+def write_workbook(output_path, raw_data_sheets, trade_events, summary_df, interval_summary, pivot_df,
+                   pivot_df_chart, grade_summary, cap_summary, write_trade_logs=True, strategy_summary=None,
+                   bootstrap_summary=None):
+    # Every sheet is written strictly row by row so the workbook can run in
+    # xlsxwriter's constant_memory mode (rows are flushed to disk as we go).
+    import xlsxwriter  # only runs that write a workbook load it
+
+    workbook = xlsxwriter.Workbook(output_path, {"constant_memory": True, "nan_inf_to_errors": True})
+    formats = _Formats(workbook)
+    try:
+        _write_raw_data(workbook, formats, raw_data_sheets, trade_events, write_trade_logs)
+        _write_trade_results(workbook, formats, summary_df)
+        _write_interval_summary(workbook, formats, interval_summary, pivot_df, pivot_df_chart)
+        _write_cap_grade(workbook, formats, grade_summary, cap_summary)
+        if strategy_summary is not None:
+            _write_strategy_comparison(workbook, formats, strategy_summary)
+        if bootstrap_summary is not None:
+            _write_bootstrap(workbook, formats, bootstrap_summary)
+    finally:
+        workbook.close()
+
+
+def _write_raw_data(workbook, formats, raw_data_sheets, trade_events, write_trade_logs):
+    raw_ws = workbook.add_worksheet("Raw Data")
+    header_format = formats.get(bold=True, align='center', valign='vcenter', border=1, bg_color='#D9D9D9')
+    date_format = formats.get(num_format='yyyy-mm-dd hh:mm:ss', align='center')
+    col_format = formats.get(align='center')
+    trade_log_format = formats.get(align='left')
+
+    start_row = 0
+    df_raw = None
+    trade_log = []
+    for sheet_name, df_raw in raw_data_sheets.items():
+        ticker, interval = sheet_name.rsplit('_', 1)
+        timestamps = df_raw['timestamp'].dt.to_pydatetime()
+        date_str = timestamps[0].strftime("%Y-%m-%d")
+        header_title = f"{ticker} - Interval: {interval} [{date_str}]"
+
+        # Trade log text is rendered from the event records only here, and only if wanted
+        trade_log = format_trade_log(trade_events[sheet_name]) if write_trade_logs and sheet_name in trade_events else []
+
+        raw_ws.merge_range(start_row, 0, start_row, len(df_raw.columns) - 1, header_title, header_format)
+        raw_ws.write_row(start_row + 1, 0, list(df_raw.columns), header_format)
+
+        values = df_raw[RAW_COLUMNS[1:]].to_numpy().tolist()
+        first_data_row = start_row + 2
+        for row_idx in range(max(len(values), len(trade_log))):
+            row = first_data_row + row_idx
+            if row_idx < len(values):
+                raw_ws.write_datetime(row, 0, timestamps[row_idx], date_format)
+                raw_ws.write_row(row, 1, values[row_idx], col_format)
+            if row_idx < len(trade_log):
+                raw_ws.write(row, LOG_COLUMN, trade_log[row_idx], trade_log_format)
+
+        # A log longer than the bar block pushes the next block down instead of overlapping it
+        start_row += max(len(df_raw), len(trade_log)) + 3
+
+    # Column widths of the last block win (same as setting them per block)
+    if df_raw is not None:
+        for col_idx, col_name in enumerate(df_raw.columns):
+            raw_ws.set_column(col_idx, col_idx, _column_width(df_raw[col_name], col_name))
+        max_log_len = max([len(entry) for entry in trade_log] + [10]) if trade_log else 10
+        raw_ws.set_column(LOG_COLUMN, LOG_COLUMN, max_log_len)
+
+
+def _write_trade_results(workbook, formats, summary_df):
+    results_ws = workbook.add_worksheet("Trade Results")
+
+    for i, column in enumerate(summary_df.columns):
+        fmt = None
+        if column in ["Win Rate (%)", "Total % Return", "Avg % Return"]:
+            fmt = formats.get(num_format='0.00%', align='center')
+        elif column == "EV/AVG RISK":
+            fmt = formats.get(num_format='0.00', align='center')
+        results_ws.set_column(i, i, _column_width(summary_df[column], column), fmt)
+
+    results_ws.write_row(0, 0, list(summary_df.columns))
+    for row_idx, row in enumerate(summary_df.itertuples(index=False), start=1):
+        results_ws.write_row(row_idx, 0, [_cell(value) for value in row])
+
+
+def _write_frame(ws, start_row, df):
+    # Header + values the way DataFrame.to_excel(index=False) lays them out
+    ws.write_row(start_row, 0, list(df.columns))
+    for row_idx, row in enumerate(df.itertuples(index=False), start=start_row + 1):
+        for col_idx, value in enumerate(row):
+            if not pd.isna(value):
+                ws.write(row_idx, col_idx, value)
+
+
+def _write_interval_summary(workbook, formats, interval_summary, pivot_df, pivot_df_chart, overlay_tickers=None):
+    summary_ws = workbook.add_worksheet("Summary by Interval")
+    chart_start_row = len(interval_summary) + 5
+
+    for i, column in enumerate(interval_summary.columns):
+        fmt = None
+        if column in ["Avg Win Rate (%)", "Total % Return", "Avg % Return"]:
+            fmt = formats.get(num_format='0.00%', align='center')
+        elif column == "Avg EV/AVG RISK":
+            fmt = formats.get(num_format='0.00', align='center')
+        summary_ws.set_column(i, i, _column_width(interval_summary[column], column), fmt)
+
+    number_format = formats.get(num_format='0.00', align='center')
+    for j in range(1, len(pivot_df.columns)):
+        summary_ws.set_column(j, j, _column_width(pivot_df.iloc[:, j], pivot_df.columns[j]), number_format)
+
+    _write_frame(summary_ws, 0, interval_summary)
+    _write_frame(summary_ws, chart_start_row, pivot_df_chart)
+
+    chart = workbook.add_chart({'type': 'column'})
+    chart.add_series({
+        'name': 'Avg EV',
+        'categories': ['Summary by Interval', 1, 0, len(interval_summary), 0],
+        'values': ['Summary by Interval', 1, 2, len(interval_summary), 2],
+        'fill': {'color': '#BFBFBF'},
+        'border': {'color': 'black'}
+    })
+    # Overlay ticker line charts (the first overlay_tickers rows when limited)
+    n_overlay = len(pivot_df) if overlay_tickers is None else min(len(pivot_df), overlay_tickers)
+    for i in range(n_overlay):
+        ticker = pivot_df.loc[i, "Ticker"]
+        chart.add_series({
+            'name':       ticker,
+            'categories': ['Summary by Interval', chart_start_row, 1,
+                           chart_start_row, len(pivot_df.columns) - 1],
+            'values':     ['Summary by Interval', chart_start_row + 1 + i, 1,
+                           chart_start_row + 1 + i, len(pivot_df.columns) - 1],
+            'type': 'line',
+            'marker': {'type': 'circle', 'size': 4}
+        })
+
+    chart.set_title({'name': 'Interval vs Avg EV (w/ Ticker Overlay)'})
+    chart.set_x_axis({'name': 'Interval', 'label_position': 'low'})
+    chart.set_y_axis({'name': 'Expected Value'})
+    chart.set_size({'width': 720, 'height': 400})
+    summary_ws.insert_chart("J2", chart)
+
+
+def _write_cap_grade(workbook, formats, grade_summary, cap_summary):
+    analysis_ws = workbook.add_worksheet("Cap & Grade Analysis")
+    center = formats.get(align='center')
+    number_format = formats.get(num_format='0.00', align='center')
+
+    for i, column in enumerate(["Grade", "Avg EV by Grade"]):
+        max_len = max(_text_lengths(grade_summary[column]).max(), len(column)) + 2 if not grade_summary.empty else 10
+        analysis_ws.set_column(i, i, max_len, number_format if column == "Avg EV by Grade" else center)
+    for i, column in enumerate(["Cap", "Avg EV by Cap"]):
+        col_idx = i + 15
+        max_len = max(_text_lengths(cap_summary[column]).max(), len(column)) + 2 if not cap_summary.empty else 10
+        analysis_ws.set_column(col_idx, col_idx, max_len, number_format if column == "Avg EV by Cap" else center)
+
+    analysis_ws.write_row(0, 0, ["Grade", "Avg EV by Grade"])
+    analysis_ws.write_row(0, 15, ["Cap", "Avg EV by Cap"])
+    grade_rows = grade_summary[["Grade", "Avg EV by Grade"]].values.tolist()
+    cap_rows = cap_summary[["Cap", "Avg EV by Cap"]].values.tolist()
+    for i in range(max(len(grade_rows), len(cap_rows))):
+        if i < len(grade_rows):
+            analysis_ws.write_row(i + 1, 0, grade_rows[i])
+        if i < len(cap_rows):
+            analysis_ws.write_row(i + 1, 15, cap_rows[i])
+
+    if not grade_summary.empty:
+        grade_chart = workbook.add_chart({'type': 'column'})
+        grade_chart.add_series({
+            'name': 'Avg EV by Grade',
+            'categories': ['Cap & Grade Analysis', 1, 0, len(grade_summary), 0],
+            'values': ['Cap & Grade Analysis', 1, 1, len(grade_summary), 1],
+            'fill': {'color': '#BFBFBF'},
+            'border': {'color': 'black'}
+        })
+        grade_chart.set_title({'name': 'Avg EV by Grade Across Companies'})
+        grade_chart.set_x_axis({'name': 'Grade', 'label_position': 'low'})
+        grade_chart.set_y_axis({'name': 'Avg Expected Value'})
+        grade_chart.set_size({'width': 720, 'height': 400})
+        analysis_ws.insert_chart('C2', grade_chart)
+
+    if not cap_summary.empty:
+        cap_chart = workbook.add_chart({'type': 'column'})
+        cap_chart.add_series({
+            'name': 'Avg EV by Cap',
+            'categories': ['Cap & Grade Analysis', 1, 15, len(cap_summary), 15],
+            'values': ['Cap & Grade Analysis', 1, 16, len(cap_summary), 16],
+            'fill': {'color': '#BFBFBF'},
+            'border': {'color': 'black'}
+        })
+        cap_chart.set_title({'name': 'Avg EV by Cap Type Across Companies'})
+        cap_chart.set_x_axis({'name': 'Cap Type', 'label_position': 'low'})
+        cap_chart.set_y_axis({'name': 'Avg Expected Value'})
+        cap_chart.set_size({'width': 720, 'height': 400})
+        analysis_ws.insert_chart('R2', cap_chart)
+
+
+def _write_strategy_comparison(workbook, formats, strategy_summary):
+    # One row per interval, every strategy's summary numbers side by side
+    # (summarize_strategies), with the strategies' Avg EV charted together
+    comparison_ws = workbook.add_worksheet("Strategy Comparison")
+    for i, column in enumerate(strategy_summary.columns):
+        fmt = None
+        if column.startswith(("Avg Win Rate (%)", "Total % Return", "Avg % Return")):
+            fmt = formats.get(num_format='0.00%', align='center')
+        elif column != "Interval":
+            fmt = formats.get(num_format='0.00', align='center')
+        comparison_ws.set_column(i, i, _column_width(strategy_summary[column], column), fmt)
+    _write_frame(comparison_ws, 0, strategy_summary)
+
+    ev_columns = [i for i, column in enumerate(strategy_summary.columns) if column.startswith("Avg EV [")]
+    if len(strategy_summary) and ev_columns:
+        chart = workbook.add_chart({'type': 'column'})
+        for col_idx in ev_columns:
+            chart.add_series({
+                'name': ['Strategy Comparison', 0, col_idx],
+                'categories': ['Strategy Comparison', 1, 0, len(strategy_summary), 0],
+                'values': ['Strategy Comparison', 1, col_idx, len(strategy_summary), col_idx],
+            })
+        chart.set_title({'name': 'Avg EV by Interval and Strategy'})
+        chart.set_x_axis({'name': 'Interval', 'label_position': 'low'})
+        chart.set_y_axis({'name': 'Expected Value'})
+        chart.set_size({'width': 720, 'height': 400})
+        comparison_ws.insert_chart(len(strategy_summary) + 3, 0, chart)
+
+
+def _write_bootstrap(workbook, formats, bootstrap_summary):
+    bootstrap_ws = workbook.add_worksheet("Bootstrap")
+    for i, column in enumerate(bootstrap_summary.columns):
+        fmt = formats.get(align='center')
+        if column.startswith(("Win Rate", "Median Max Drawdown", "95th Pct Max Drawdown", "Risk of Ruin")):
+            fmt = formats.get(num_format='0.00%', align='center')
+        elif column.startswith("EV"):
+            fmt = formats.get(num_format='0.0000', align='center')
+        bootstrap_ws.set_column(i, i, _column_width(bootstrap_summary[column], column), fmt)
+    _write_frame(bootstrap_ws, 0, bootstrap_summary)
+
+
+def write_table_sinks(output_path, formats, raw_data_sheets, summary_df):
+    # Raw bars (one long table) and trade results as CSV and/or Parquet files
+    # next to the workbook, e.g. results.xlsx -> results_raw_bars.parquet
+    base = os.path.splitext(output_path)[0]
+    frames = []
+    for sheet_name, df_raw in raw_data_sheets.items():
+        ticker, interval = sheet_name.rsplit('_', 1)
+        frames.append(df_raw.assign(Ticker=ticker, Interval=interval))
+    raw_bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=RAW_COLUMNS + ["Ticker", "Interval"])
+    raw_bars = raw_bars[["Ticker", "Interval"] + RAW_COLUMNS]
+
+    for fmt in formats:
+        for name, df in (("raw_bars", raw_bars), ("trade_results", summary_df)):
+            path = f"{base}_{name}.{fmt}"
+            try:
+                if fmt == "csv":
+                    df.to_csv(path, index=False)
+                elif fmt == "parquet":
+                    df.to_parquet(path, index=False)
+                else:
+                    print(f"Unknown export format '{fmt}', skipping")
+                    break
+            except ImportError as e:
+                print(f"Cannot write {path}: {e}")
+                continue
+            print(f"Wrote {path}")
+
+
+def write_summary_workbook(output_path, interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary,
+                           overlay_tickers=None, strategy_summary=None):
+    # The summary sheets only, for streamed runs whose raw bars and trade
+    # results go to table files instead of the workbook
+    import xlsxwriter  # only runs that write a workbook load it
+
+    workbook = xlsxwriter.Workbook(output_path, {"constant_memory": True, "nan_inf_to_errors": True})
+    formats = _Formats(workbook)
+    try:
+        _write_interval_summary(workbook, formats, interval_summary, pivot_df, pivot_df_chart, overlay_tickers)
+        _write_cap_grade(workbook, formats, grade_summary, cap_summary)
+        if strategy_summary is not None:
+            _write_strategy_comparison(workbook, formats, strategy_summary)
+    finally:
+        workbook.close()
+
+
+class TableAppender:
+    # One CSV or Parquet file written a chunk at a time, so a table never has
+    # to be held in memory whole. Parquet needs pyarrow (checked on open).
+
+    def __init__(self, path, fmt):
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unknown table format '{fmt}', expected 'csv' or 'parquet'")
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def append(self, df):
+        if df.empty:
+            return
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = table.cast(self._writer.schema)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+import heapq
+from functools import partial
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backtester.analyze import NS_PER_DAY, _time_of_day_ns, new_trade_events, record_trade_event, run_trailing_stop_strategy
+from backtester.strategies import DEFAULT_STRATEGY, STRATEGIES, check_strategies
+
+# Returned by on_bar when a bar changes nothing
+NO_EVENTS = ()
+
+
+class TrailingStopState:
+    # Incremental run_trailing_stop_strategy (bar fills): the same rules and
+    # stats, with the day's state kept here and each bar consumed as it
+    # closes in constant time, so live or replayed days never need the whole
+    # day up front. Feed a ticker/date's bars in time order to on_bar, which
+    # returns the trade events they cause; end_day() closes an open position
+    # at the last session close and stats() returns the engine's stats dict.
+    __slots__ = ("short", "trail", "capitulation_threshold", "window_start", "window_end", "session_start",
+                 "session_end", "n", "prev_high", "prev_low", "extreme", "last_time", "last_close", "position",
+                 "entry_price", "stop_price", "capitulation_occurred", "num_trades", "wins", "losses",
+                 "total_pnl", "total_percent_return", "win_total", "loss_total", "rr_total", "max_pnl",
+                 "min_pnl", "units_risked", "closed", "events")
+
+    def __init__(self, start_time="09:30", end_time="16:00", side="short", trail=True, capitulation_threshold=0.10,
+                 session_start="04:00", session_end="20:00"):
+        self.short = side == "short"
+        self.trail = trail
+        self.capitulation_threshold = capitulation_threshold
+        self.window_start = _time_of_day_ns(start_time)
+        self.window_end = _time_of_day_ns(end_time)
+        self.session_start = _time_of_day_ns(session_start)
+        self.session_end = _time_of_day_ns(session_end)
+        self.n = 0
+        self.prev_high = None
+        self.prev_low = None
+        # High (short) / low (long) of day, not counting the first session bar
+        self.extreme = -np.inf if self.short else np.inf
+        self.last_time = None
+        self.last_close = None
+        self.position = False
+        self.entry_price = None
+        self.stop_price = None
+        self.capitulation_occurred = False
+        self.num_trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.total_pnl = 0.0
+        self.total_percent_return = 0.0
+        self.win_total = 0.0
+        self.loss_total = 0.0
+        self.rr_total = 0.0
+        self.max_pnl = None
+        self.min_pnl = None
+        self.units_risked = 0
+        self.closed = False
+        self.events = new_trade_events()
+
+    def on_bar(self, time, high, low, close):
+        # time: bar open, int64 ns (naive ET) -> tuple of the events it caused
+        time_of_day = time % NS_PER_DAY
+        if not self.session_start <= time_of_day <= self.session_end:
+            return NO_EVENTS
+        self.n += 1
+        prev_high, prev_low = self.prev_high, self.prev_low
+        self.prev_high, self.prev_low = high, low
+        self.last_time, self.last_close = time, close
+        if self.n == 1:
+            return NO_EVENTS
+        short = self.short
+        self.extreme = max(self.extreme, high) if short else min(self.extreme, low)
+
+        if not self.position:
+            if self.capitulation_occurred or not self.window_start <= time_of_day <= self.window_end:
+                return NO_EVENTS
+            if not ((low < prev_low) if short else (high > prev_high)):
+                return NO_EVENTS
+            self.position = True
+            self.num_trades += 1
+            self.entry_price = prev_low if short else prev_high
+            self.stop_price = self.extreme
+            return (self._record(time, "ENTER", self.entry_price, self.stop_price),)
+
+        events = []
+        if self.trail:
+            trailing_stop = prev_high if short else prev_low
+            if (trailing_stop < self.stop_price) if short else (trailing_stop > self.stop_price):
+                events.append(self._record(time, "TRAIL", self.stop_price, trailing_stop))
+                self.stop_price = trailing_stop
+
+        if (high >= self.stop_price) if short else (low <= self.stop_price):
+            exit_price = self.stop_price
+            if short:
+                pnl = self.entry_price - exit_price
+                risk = self.extreme - self.entry_price
+            else:
+                pnl = exit_price - self.entry_price
+                risk = self.entry_price - self.extreme
+            rr_ratio = pnl / risk if risk > 0 else 0
+            events.append(self._record(time, "EXIT", exit_price, self.stop_price, pnl, risk, rr_ratio))
+            self._close_trade(pnl, risk, rr_ratio)
+
+            extreme = self.extreme
+            move_from_extreme = (extreme - exit_price) / extreme if short else (exit_price - extreme) / extreme
+            if move_from_extreme >= self.capitulation_threshold:
+                self.capitulation_occurred = True
+        return tuple(events)
+
+    def end_day(self):
+        # Closes a position still open at the last session bar's close -> events
+        if self.closed:
+            return NO_EVENTS
+        self.closed = True
+        if not self.position:
+            return NO_EVENTS
+        final_close = float(self.last_close)
+        if self.short:
+            pnl = self.entry_price - final_close
+            risk = max(self.stop_price - self.entry_price, 0.01)
+        else:
+            pnl = final_close - self.entry_price
+            risk = max(self.entry_price - self.stop_price, 0.01)
+        rr_ratio = abs(pnl) / risk if risk > 0 else 0
+        event = self._record(int(self.last_time), "EOD_EXIT", final_close, self.stop_price, pnl, risk, rr_ratio)
+        self._close_trade(pnl, risk, rr_ratio)
+        return (event,)
+
+    def _record(self, time, event, price, stop, pnl=None, risk=None, rr=None):
+        record_trade_event(self.events, int(time), event, price, stop, pnl, risk, rr)
+        return (int(time), event, price, stop, pnl, risk, rr)
+
+    def _close_trade(self, pnl, risk, rr_ratio):
+        self.position = False
+        self.units_risked += risk
+        self.total_pnl += pnl
+        self.total_percent_return += (pnl / self.entry_price) * 100
+        self.max_pnl = pnl if self.max_pnl is None else max(self.max_pnl, pnl)
+        self.min_pnl = pnl if self.min_pnl is None else min(self.min_pnl, pnl)
+        if pnl > 0:
+            self.win_total += pnl
+            self.wins += 1
+        else:
+            self.loss_total += pnl
+            self.losses += 1
+        self.rr_total += rr_ratio
+
+    def stats(self):
+        # Same dict (and rounding) as run_trailing_stop_strategy; call after end_day()
+        num_trades = self.num_trades
+        closed = self.wins + self.losses
+        win_rate = self.wins / num_trades if num_trades > 0 else 0
+        loss_rate = self.losses / num_trades if num_trades > 0 else 0
+        avg_win = self.win_total / self.wins if self.wins else 0
+        avg_loss = self.loss_total / self.losses if self.losses else 0
+        expected_value = (win_rate * avg_win) + (loss_rate * avg_loss)
+        avg_rr = self.rr_total / closed if closed else 0
+        avg_percent_return = self.total_percent_return / closed if closed else 0
+        ev_risk = expected_value / self.units_risked if self.units_risked else 0
+        return {
+            "pnl": round(np.float64(self.total_pnl), 2),
+            "EV": round(np.float64(expected_value), 2),
+            "win_rate": round(win_rate * 100, 2),
+            "avg_risk_reward": round(np.float64(avg_rr), 2),
+            "total_trades": num_trades,
+            "wins": self.wins,
+            "losses": self.losses,
+            "max_pnl": round(np.float64(self.max_pnl if closed else 0), 2),
+            "min_pnl": round(np.float64(self.min_pnl if closed else 0), 2),
+            "total_percent_return": round(np.float64(self.total_percent_return), 2),
+            "avg_percent_return": round(np.float64(avg_percent_return), 2),
+            "ev_risk": round(np.float64(ev_risk), 4),
+            "events": self.events
+        }
+
+
+def live_strategy_params(name):
+    # Registered strategy -> TrailingStopState keyword arguments. Only
+    # strategies that are run_trailing_stop_strategy with fixed arguments
+    # (all built-in ones) have an incremental version.
+    run = STRATEGIES[name]
+    if not (isinstance(run, partial) and run.func is run_trailing_stop_strategy and not run.args):
+        raise ValueError(f"Strategy '{name}' has no incremental version")
+    return dict(run.keywords)
+
+
+def new_live_states(strategies=(DEFAULT_STRATEGY,), start_time="09:30", end_time="16:00", capitulation_threshold=0.10,
+                    session_start="04:00", session_end="20:00"):
+    # -> {strategy name: fresh TrailingStopState} for one ticker/date
+    return {
+        name: TrailingStopState(start_time, end_time, capitulation_threshold=capitulation_threshold,
+                                session_start=session_start, session_end=session_end, **live_strategy_params(name))
+        for name in check_strategies(strategies)
+    }
+
+
+def replay_bars(units, strategies=(DEFAULT_STRATEGY,), start_time="09:30", end_time="16:00",
+                capitulation_threshold=0.10, session_start="04:00", session_end="20:00", speed=None, on_event=None):
+    # units: {key: bar arrays of one ticker/date (bars_to_arrays layout)}.
+    # Replays all units bar by bar in time order, as a live scan would see
+    # them (units of the same day interleaved), each through its own states.
+    # speed: multiple of real time to pace the replay at (None: as fast as
+    # possible); overnight gaps are not waited for. on_event(key, strategy,
+    # event) is called as events happen, event being (time, event, price,
+    # stop, pnl, risk, rr). -> {key: {strategy: stats}}
+    states = {key: new_live_states(strategies, start_time, end_time, capitulation_threshold, session_start, session_end)
+              for key in units}
+    keys = list(units)
+    # Bar times are plain ints so the merge compares them cheaply
+    streams = [zip(units[key]["time"].tolist(), [k] * len(units[key]["time"]), range(len(units[key]["time"])))
+               for k, key in enumerate(keys)]
+
+    last_time = None
+    started = time.perf_counter()
+    replayed_ns = 0
+    for bar_time, k, j in heapq.merge(*streams):
+        if speed and last_time is not None and bar_time // NS_PER_DAY == last_time // NS_PER_DAY:
+            replayed_ns += bar_time - last_time
+            delay = replayed_ns / 1e9 / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        last_time = bar_time
+        key = keys[k]
+        bars = units[key]
+        high, low, close = float(bars["high"][j]), float(bars["low"][j]), float(bars["close"][j])
+        for name, state in states[key].items():
+            events = state.on_bar(bar_time, high, low, close)
+            if on_event is not None:
+                for event in events:
+                    on_event(key, name, event)
+
+    results = {}
+    for key, unit_states in states.items():
+        for name, state in unit_states.items():
+            events = state.end_day()
+            if on_event is not None:
+                for event in events:
+                    on_event(key, name, event)
+        results[key] = {name: state.stats() for name, state in unit_states.items()}
+    return results
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backtester.analyze import TICK_FIELDS
+from backtester.strategies import run_strategies
+
+# Row order of the packed bar block; time is stored as int64 in a float64-sized slot
+BAR_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+# /dev/shm keeps the packed bars in RAM on Linux; elsewhere the page cache does
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class UnitExecutor:
+    # Runs the strategies over many units' bar arrays. With workers > 1 the bars
+    # of a batch are packed into one memory-mapped block that worker processes
+    # map read-only (no pickled DataFrames); results come back in input order.
+    # Tick arrays of tick-fill units go into a second block the same way.
+
+    def __init__(self, workers=1, strategy_params=None):
+        self.workers = max(1, int(workers or 1))
+        self.strategy_params = strategy_params or {}
+        self.worker_times = {}
+        self.unit_seconds = []
+        self._pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def map(self, bars_list):
+        # Returns [({strategy: stats}, error_message)] aligned with bars_list
+        if not bars_list:
+            return []
+        if self._pool is None:
+            results, unit_seconds = _run_units(bars_list, self.strategy_params)
+            self._record_time(os.getpid(), unit_seconds)
+            return results
+
+        path, total, slices = _pack_bars(bars_list)
+        tick_path, tick_total, tick_slices = _pack_ticks(bars_list)
+        try:
+            chunk_size = -(-len(slices) // self.workers)
+            futures = [
+                self._pool.submit(_run_chunk, path, total, slices[i:i + chunk_size], self.strategy_params,
+                                  tick_path, tick_total, tick_slices[i:i + chunk_size] if tick_slices else None)
+                for i in range(0, len(slices), chunk_size)
+            ]
+            results = []
+            for future in futures:
+                pid, chunk_results, unit_seconds = future.result()
+                self._record_time(pid, unit_seconds)
+                results.extend(chunk_results)
+            return results
+        finally:
+            os.remove(path)
+            if tick_path is not None:
+                os.remove(tick_path)
+
+    def _record_time(self, pid, unit_seconds):
+        entry = self.worker_times.setdefault(pid, [0, 0.0])
+        entry[0] += len(unit_seconds)
+        entry[1] += sum(unit_seconds)
+        self.unit_seconds.extend(unit_seconds)
+
+    def timing_report(self):
+        return [
+            {"worker": pid, "units": units, "seconds": round(seconds, 3),
+             "units_per_sec": round(units / seconds, 1) if seconds else None}
+            for pid, (units, seconds) in sorted(self.worker_times.items())
+        ]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _run_units(bars_iter, params):
+    # -> ([({strategy: stats}, error)], [seconds per unit])
+    results = []
+    unit_seconds = []
+    for bars in bars_iter:
+        start = time.perf_counter()
+        results.append(_run_unit(bars, params))
+        unit_seconds.append(time.perf_counter() - start)
+    return results, unit_seconds
+
+
+def _run_unit(bars, params):
+    try:
+        return run_strategies(bars, **params), None
+    except Exception as e:
+        return None, f"{e}\n{traceback.format_exc()}"
+
+
+def _pack_bars(bars_list):
+    lengths = [len(bars["time"]) for bars in bars_list]
+    total = sum(lengths)
+    fd, path = tempfile.mkstemp(prefix="capitulation_bars_", suffix=".bin", dir=SHARED_DIR)
+    os.close(fd)
+    block = np.memmap(path, dtype=np.float64, mode="w+", shape=(len(BAR_FIELDS), max(total, 1)))
+
+    slices = []
+    offset = 0
+    for bars, length in zip(bars_list, lengths):
+        block[0, offset:offset + length].view(np.int64)[:] = bars["time"]
+        for row, field in enumerate(BAR_FIELDS[1:], start=1):
+            block[row, offset:offset + length] = bars[field]
+        slices.append((offset, length))
+        offset += length
+    block.flush()
+    del block
+    return path, max(total, 1), slices
+
+
+def _pack_ticks(bars_list):
+    # Tick arrays of tick-fill units, packed once per ticker/date (all its
+    # intervals share the same arrays) -> (path, total, slices) or Nones
+    if "tick_time" not in bars_list[0]:
+        return None, 0, None
+    packed = {}
+    slices = []
+    total = 0
+    for bars in bars_list:
+        key = id(bars["tick_time"])
+        if key not in packed:
+            packed[key] = (total, len(bars["tick_time"]), bars)
+            total += len(bars["tick_time"])
+        slices.append(packed[key][:2])
+
+    fd, path = tempfile.mkstemp(prefix="capitulation_ticks_", suffix=".bin", dir=SHARED_DIR)
+    os.close(fd)
+    block = np.memmap(path, dtype=np.float64, mode="w+", shape=(len(TICK_FIELDS), max(total, 1)))
+    for offset, length, bars in packed.values():
+        block[0, offset:offset + length].view(np.int64)[:] = bars["tick_time"]
+        block[1, offset:offset + length] = bars["tick_price"]
+    block.flush()
+    del block
+    return path, max(total, 1), slices
+
+
+def _run_chunk(path, total, slices, params, tick_path=None, tick_total=0, tick_slices=None):
+    block = np.memmap(path, dtype=np.float64, mode="r", shape=(len(BAR_FIELDS), total))
+    ticks = np.memmap(tick_path, dtype=np.float64, mode="r", shape=(len(TICK_FIELDS), tick_total)) if tick_path else None
+
+    def unit_bars():
+        for k, (offset, length) in enumerate(slices):
+            bars = {"time": block[0, offset:offset + length].view(np.int64)}
+            for row, field in enumerate(BAR_FIELDS[1:], start=1):
+                bars[field] = block[row, offset:offset + length]
+            if ticks is not None:
+                tick_offset, tick_length = tick_slices[k]
+                bars["tick_time"] = ticks[0, tick_offset:tick_offset + tick_length].view(np.int64)
+                bars["tick_price"] = ticks[1, tick_offset:tick_offset + tick_length]
+            yield bars
+
+    results, unit_seconds = _run_units(unit_bars(), params)
+    del block, ticks
+    return os.getpid(), results, unit_seconds
@@ -0,0 +1,153 @@
+import itertools
+import pandas as pd
+import sys
+import os
+import traceback
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from marketData.fetchPipeline import iter_fetched_bars
+from marketData.dataSource import open_data_source
+from marketData.asyncFetch import FETCH_DEADLINE_SEC, FETCH_RETRIES
+from marketData.tickCache import TickCache
+from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS
+from marketData.barStore import BarStore
+from backtester.analyze import FILL_MODES
+from backtester.batchBacktest import build_result_row, day_tick_arrays, read_trade_list, unit_arrays
+from backtester.strategies import DEFAULT_STRATEGY, check_strategies, run_strategies
+from runMetrics import METRICS
+
+# Strategy knobs that can be swept (besides the interval)
+SWEEP_PARAMETERS = ["start_time", "end_time", "capitulation_threshold", "session_start", "session_end"]
+
+
+def expand_grid(param_grid):
+    unknown = set(param_grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    for name, values in param_grid.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Sweep parameter '{name}' needs a non-empty list of values, got {values!r}")
+    names = [name for name in SWEEP_PARAMETERS if name in param_grid]
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def run_parameter_sweep(excel_path, intervals, param_grid, output_path=None, cache_dir=None, cache_max_mb=2048, fetch_workers=4,
+                        data_source="shel", record_dir=None, fetch_deadline=FETCH_DEADLINE_SEC, fetch_retries=FETCH_RETRIES,
+                        write_run_report=True, bar_store_dir=None, fetch_range_days=1, strategies=(DEFAULT_STRATEGY,),
+                        fill_mode="bar"):
+    # Bars for each ticker/date are fetched and built once, converted to arrays
+    # once per interval, and every parameter set is evaluated against them
+    # for every strategy (with tick fills, against the day's ticks too).
+    METRICS.reset()
+    try:
+        strategies = check_strategies(strategies)
+        if fill_mode not in FILL_MODES:
+            raise ValueError(f"Unknown fill mode: {fill_mode}, expected one of {list(FILL_MODES)}")
+    except ValueError as e:
+        print(str(e))
+        return None
+    multi_strategy = len(strategies) > 1
+
+    try:
+        trades = read_trade_list(excel_path)
+    except Exception as e:
+        print(f"Error reading Excel file: {str(e)}")
+        return None
+
+    param_sets = expand_grid(param_grid)
+    param_names = list(param_sets[0]) if param_sets else []
+    print(f"Sweeping {len(param_sets)} parameter sets x {len(intervals)} intervals over {len(trades)} trades")
+
+    cache = TickCache(cache_dir, cache_max_mb) if cache_dir else None
+    bar_store = BarStore(bar_store_dir, (EXCLUDED_FLAGS, EXCLUDED_MARKETS)) if bar_store_dir else None
+    # Repeated ticker/dates are swept (and counted in the summary) once
+    jobs = []
+    seen = set()
+    for idx, ticker, date in zip(trades.index, trades["Ticker"], trades["Date"]):
+        if pd.isna(date) or (ticker, date) in seen:
+            continue
+        seen.add((ticker, date))
+        jobs.append((idx, ticker, date))
+
+    source = open_data_source(data_source, record_dir, fetch_workers, fetch_deadline, fetch_retries)
+    rows = []
+    try:
+        for idx, bars_by_interval, fetch_error in iter_fetched_bars(jobs, intervals, workers=fetch_workers, cache=cache,
+                                                                    data_source=source, keep_ticks=fill_mode == "tick",
+                                                                    bar_store=bar_store, range_days=fetch_range_days):
+            ticker = trades.at[idx, "Ticker"]
+            date = trades.at[idx, "Date"]
+            if fetch_error is not None:
+                print(f" → Error fetching {ticker}, {date}: {str(fetch_error)}")
+                continue
+
+            tick_arrays = day_tick_arrays(bars_by_interval)
+            for interval in intervals:
+                df = bars_by_interval[interval]
+                if df.empty:
+                    print(f" → No data for {ticker} on {date} at {interval}")
+                    continue
+                bars = unit_arrays(df, tick_arrays)
+                for set_id, params in enumerate(param_sets):
+                    try:
+                        with METRICS.stage("strategy"):
+                            stats_by_strategy = run_strategies(bars, strategies, **params)
+                    except Exception as e:
+                        print(f" → Error processing {ticker}, {date}, {interval}, {params}: {str(e)}")
+                        print(f" → Stack trace: {traceback.format_exc()}")
+                        continue
+                    for name, stats in stats_by_strategy.items():
+                        row = {"Param Set": set_id, **params}
+                        row.update(build_result_row(ticker, date, interval, stats))
+                        if multi_strategy:
+                            row["Strategy"] = name
+                        rows.append(row)
+            print(f" → Swept {ticker}, {date}")
+    finally:
+        source.close()
+        if bar_store is not None:
+            bar_store_stats = bar_store.stats()
+            bar_store.close()
+
+    results_df = pd.DataFrame(rows)
+    if results_df.empty:
+        print("No sweep results produced")
+        return results_df
+
+    group_keys = ["Param Set"] + param_names + (["Strategy"] if multi_strategy else []) + ["Interval"]
+    summary_df = results_df.groupby(group_keys, sort=False).agg(**{
+        "Units": ("EV", "size"),
+        "Total P&L": ("P&L", "sum"),
+        "Avg EV": ("EV", "mean"),
+        "Avg Win Rate (%)": ("Win Rate (%)", "mean"),
+        "Avg Risk/Reward": ("Avg R/R", "mean"),
+        "Total Trades": ("Total Trades", "sum"),
+        "Avg % Return": ("Avg % Return", "mean"),
+        "Avg EV/AVG RISK": ("EV/AVG RISK", "mean"),
+    }).reset_index()
+    summary_df = summary_df.round({"Avg EV": 2, "Avg Win Rate (%)": 4, "Avg Risk/Reward": 2, "Avg % Return": 4, "Avg EV/AVG RISK": 2})
+
+    if output_path:
+        with pd.ExcelWriter(output_path, engine="xlsxwriter") as writer:
+            summary_df.sort_values(by="Avg EV", ascending=False).to_excel(writer, sheet_name="Sweep Summary", index=False)
+            results_df.to_excel(writer, sheet_name="Sweep Results", index=False)
+        print(f"Sweep done! Results saved to '{output_path}'")
+
+    if cache is not None:
+        print(f"Tick cache stats: {cache.stats()}")
+    if bar_store is not None:
+        print(f"Bar store stats: {bar_store_stats}")
+
+    if write_run_report and output_path:
+        report_path = f"{os.path.splitext(output_path)[0]}_run_report.json"
+        METRICS.write_json(
+            report_path,
+            config={"intervals": list(intervals), "param_sets": param_sets, "fetch_workers": fetch_workers,
+                    "data_source": data_source, "fetch_deadline": fetch_deadline, "fetch_retries": fetch_retries,
+                    "fetch_range_days": fetch_range_days, "strategies": strategies, "fill_mode": fill_mode},
+            tick_cache=cache.stats() if cache is not None else None,
+            bar_store=bar_store_stats if bar_store is not None else None,
+        )
+        print(f"Run report saved to '{report_path}'")
+
+    return results_df
@@ -0,0 +1,160 @@
+import io
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS
+from backtester.strategies import DEFAULT_STRATEGY
+
+# Bumped whenever the stored row layout changes
+RESULT_STORE_VERSION = 1
+
+# Sources whose changes invalidate stored results (strategy + bar building)
+CODE_VERSION_FILES = [
+    os.path.join(os.path.dirname(__file__), "analyze.py"),
+    os.path.join(os.path.dirname(__file__), "strategies.py"),
+    os.path.join(os.path.dirname(__file__), "..", "marketData", "barBuilder.py"),
+]
+
+BAR_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+def code_version():
+    digest = hashlib.sha1(repr((RESULT_STORE_VERSION, EXCLUDED_FLAGS, EXCLUDED_MARKETS)).encode())
+    for path in CODE_VERSION_FILES:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class ResultStore:
+    # SQLite table of finished (ticker, date, interval) units for one set of
+    # strategy parameters: the result row, the trade events and the bars.
+    # Each strategy's rows live under their own params hash; a unit counts
+    # as stored once every strategy has it, and only the first strategy's
+    # rows carry the bars.
+    # Rows written by other code versions are dropped when the store opens.
+    # Units marked incomplete (today's still-growing session) are kept for
+    # the report but recomputed on the next run. Units that could not be
+    # computed are listed in a failures table until they succeed.
+
+    def __init__(self, path, params, strategies=(DEFAULT_STRATEGY,)):
+        self.path = path
+        self.strategies = list(strategies)
+        self.params_hashes = {name: params_hash({**params, "strategy": name}) for name in self.strategies}
+        self.code_version = code_version()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            " ticker TEXT, date TEXT, interval TEXT, params_hash TEXT, code_version TEXT,"
+            " complete INTEGER, result TEXT, events TEXT, bars BLOB,"
+            " PRIMARY KEY (ticker, date, interval, params_hash, code_version))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            " ticker TEXT, date TEXT, interval TEXT, params_hash TEXT, code_version TEXT,"
+            " stage TEXT, error TEXT, failed_at TEXT,"
+            " PRIMARY KEY (ticker, date, interval, params_hash, code_version))"
+        )
+        self.conn.execute("DELETE FROM failures WHERE code_version != ?", (self.code_version,))
+        stale = self.conn.execute("DELETE FROM units WHERE code_version != ?", (self.code_version,)).rowcount
+        self.conn.commit()
+        if stale:
+            print(f"Result store: dropped {stale} units from older code versions")
+
+    def _key(self, ticker, date, interval, strategy=None):
+        strategy = strategy or self.strategies[0]
+        return (str(ticker), str(date), interval, self.params_hashes[strategy], self.code_version)
+
+    def has(self, ticker, date, interval, strategy=None):
+        # Without a strategy: stored for every strategy of this store
+        for name in [strategy] if strategy else self.strategies:
+            row = self.conn.execute(
+                "SELECT 1 FROM units WHERE ticker=? AND date=? AND interval=? AND params_hash=? AND code_version=? AND complete=1",
+                self._key(ticker, date, interval, name),
+            ).fetchone()
+            if row is None:
+                return False
+        return True
+
+    def put(self, ticker, date, interval, result, events, bars, complete=True, strategy=None):
+        blob = None
+        if bars is not None:
+            buffer = io.BytesIO()
+            np.savez(buffer, **{field: bars[field] for field in BAR_FIELDS})
+            blob = buffer.getvalue()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._key(ticker, date, interval, strategy)
+            + (int(complete), json.dumps(result, default=_json_default), json.dumps(events, default=_json_default),
+               blob),
+        )
+        self.conn.execute(
+            "DELETE FROM failures WHERE ticker=? AND date=? AND interval=? AND params_hash=? AND code_version=?",
+            self._key(ticker, date, interval, strategy),
+        )
+
+    def record_failure(self, ticker, date, interval, stage, error):
+        # A unit fails for every strategy at once (they run on the same bars)
+        for name in self.strategies:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))",
+                self._key(ticker, date, interval, name) + (stage, str(error)),
+            )
+
+    def failures(self):
+        # One entry per unit (first strategy's row)
+        rows = self.conn.execute(
+            "SELECT ticker, date, interval, stage, error, failed_at FROM failures"
+            " WHERE params_hash=? AND code_version=? ORDER BY failed_at, ticker, date, interval",
+            (self.params_hashes[self.strategies[0]], self.code_version),
+        ).fetchall()
+        return [dict(zip(("ticker", "date", "interval", "stage", "error", "failed_at"), row)) for row in rows]
+
+    def get(self, ticker, date, interval, strategy=None):
+        # -> (result row, trade events, raw bar frame or None) or None
+        row = self.conn.execute(
+            "SELECT result, events, bars FROM units"
+            " WHERE ticker=? AND date=? AND interval=? AND params_hash=? AND code_version=?",
+            self._key(ticker, date, interval, strategy),
+        ).fetchone()
+        if row is None:
+            return None
+        result, events, blob = row
+        df_raw = None
+        if blob is not None:
+            with np.load(io.BytesIO(blob)) as data:
+                df_raw = bars_to_frame(data)
+        return json.loads(result), json.loads(events), df_raw
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def bars_to_frame(bars):
+    # Bar arrays (int64 ns time) -> the raw bar frame of the report
+    df_raw = pd.DataFrame({"timestamp": np.asarray(bars["time"]).view("datetime64[ns]")})
+    for field in BAR_FIELDS[1:]:
+        df_raw[field] = bars[field]
+    return df_raw
+
+
+def _json_default(value):
+    # NumPy scalars from the array engine
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in the result store")
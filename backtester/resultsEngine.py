@@ -0,0 +1,197 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from marketData.barBuilder import interval_to_timedelta
+
+# Columns of one result row (see batchBacktest.build_result_row)
+RESULT_COLUMNS = ["Ticker", "Date", "Interval", "P&L", "EV", "Win Rate (%)", "Avg R/R", "Total Trades", "Wins",
+                  "Losses", "Max P&L", "Min P&L", "Total % Return", "Avg % Return", "EV/AVG RISK"]
+
+# Interval summary columns: (result column, "sum" or "mean")
+INTERVAL_SUMMARY_COLUMNS = {
+    "Total P&L": ("P&L", "sum"),
+    "Avg EV": ("EV", "mean"),
+    "Avg Win Rate (%)": ("Win Rate (%)", "mean"),
+    "Avg Risk/Reward": ("Avg R/R", "mean"),
+    "Total % Return": ("Total % Return", "sum"),
+    "Avg % Return": ("Avg % Return", "mean"),
+    "Avg EV/AVG RISK": ("EV/AVG RISK", "mean"),
+}
+
+
+def result_columns(strategies=None):
+    # Rows of a multi-strategy run carry a Strategy column after Interval
+    if strategies is None or len(strategies) < 2:
+        return RESULT_COLUMNS
+    return RESULT_COLUMNS[:3] + ["Strategy"] + RESULT_COLUMNS[3:]
+
+
+def build_report_tables(all_results, trades, strategies=None):
+    # Result rows + the trade list read at the start of the run -> the frames
+    # behind the workbook sheets. Everything is a merge/groupby/pivot over
+    # whole columns; the trade list is not read again. With several
+    # strategies the trade results list all of them and the interval, ticker
+    # and cap/grade tables describe the first one (see summarize_strategies).
+    columns = result_columns(strategies)
+    results = pd.DataFrame.from_records(all_results, columns=columns)
+    multi_strategy = "Strategy" in columns
+    summary_df = results.drop_duplicates(subset=["Ticker", "Interval", "Date"] + (["Strategy"] if multi_strategy else []))
+    summary_df = summary_df.merge(trades[["Ticker", "Date"]], on=["Ticker", "Date"], how="left")
+
+    # Rows are ordered by the first trade-list row of their ticker
+    first_rows = trades.drop_duplicates(subset="Ticker")
+    first_row_by_ticker = pd.Series(first_rows.index, index=first_rows["Ticker"])
+    summary_df["original_index"] = summary_df["Ticker"].map(first_row_by_ticker)
+    summary_df = summary_df.sort_values(by="original_index").drop(columns=["original_index"])
+
+    primary_df = summary_df[summary_df["Strategy"] == strategies[0]] if multi_strategy else summary_df
+    interval_summary = summarize_intervals(primary_df)
+
+    # One EV pivot; the chart copy only has its interval columns in time order
+    pivot = primary_df.pivot_table(index="Ticker", columns="Interval", values="EV", aggfunc="mean")
+    pivot_df = pivot.reset_index()
+    pivot_df_chart = pivot[sorted(pivot.columns, key=interval_to_timedelta)].reset_index()
+
+    grade_summary, cap_summary = summarize_grade_and_cap(primary_df, trades)
+    print(f"grade_summary:\n{grade_summary}")
+    print(f"cap_summary:\n{cap_summary}")
+
+    return summary_df, interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary
+
+
+def summarize_strategies(interval_summaries):
+    # {strategy: interval summary} -> one row per interval with every
+    # strategy's numbers next to each other, e.g. "Avg EV [reversal_long]"
+    frames = []
+    for name, interval_summary in interval_summaries.items():
+        frame = interval_summary.set_index("Interval")
+        frames.append(frame.rename(columns=lambda column: f"{column} [{name}]"))
+    if not frames:
+        return pd.DataFrame(columns=["Interval"])
+    side_by_side = pd.concat(frames, axis=1)
+    # Metric-major column order: each metric's strategies sit together
+    ordered = [f"{column} [{name}]" for column in INTERVAL_SUMMARY_COLUMNS for name in interval_summaries]
+    side_by_side = side_by_side[ordered].reset_index()
+    sort_key = side_by_side["Interval"].map(interval_to_timedelta)
+    return side_by_side.iloc[sort_key.argsort(kind="stable")]
+
+
+def summarize_intervals(summary_df):
+    interval_summary = summary_df.groupby("Interval").agg(**INTERVAL_SUMMARY_COLUMNS).reset_index()
+    interval_summary = interval_summary.round({"Avg EV": 2, "Avg Risk/Reward": 2, "Avg EV/AVG RISK": 2})
+
+    sort_key = interval_summary["Interval"].map(interval_to_timedelta)
+    return interval_summary.iloc[sort_key.argsort(kind="stable")] if len(interval_summary) else interval_summary
+
+
+def _cap_grade_rows(summary_df, trades):
+    # Every trade-list row joined to its results; rows without results still
+    # count towards their group (with a NaN EV), as on the original sheet
+    trade_meta = trades[["Ticker", "Date", "Grade", "Cap"]].copy()
+    trade_meta["Cap"] = trade_meta["Cap"].str.lower().replace({"medium": "Medium"})
+    cap_grade_df = trade_meta.merge(summary_df[["Ticker", "Date", "EV"]], on=["Ticker", "Date"], how="left")
+    cap_grade_df["Grade"] = cap_grade_df["Grade"].fillna("Unknown")
+    cap_grade_df["Cap"] = cap_grade_df["Cap"].fillna("Unknown")
+    return cap_grade_df
+
+
+def summarize_grade_and_cap(summary_df, trades):
+    cap_grade_df = _cap_grade_rows(summary_df, trades)
+    print(f"cap_grade_df: {len(cap_grade_df)} trade/result rows")
+
+    grade_summary = cap_grade_df.groupby("Grade").agg(**{"Avg EV by Grade": ("EV", "mean")}).reset_index()
+    cap_summary = cap_grade_df.groupby("Cap").agg(**{"Avg EV by Cap": ("EV", "mean")}).reset_index()
+    return grade_summary, cap_summary
+
+
+
+class StreamingSummary:
+    # The summary tables of build_report_tables, built up one trade-list
+    # chunk at a time from running sums and counts. Memory grows with the
+    # number of tickers, grades and caps, not with the number of rows.
+    # Like build_report_tables, a result counts once per trade-list row of
+    # its ticker/date. Rows repeated across chunks are backtested (or read
+    # from the result store) again in each chunk, which keeps the interval
+    # and ticker tables equal to the in-memory ones; only the Cap/Grade
+    # means weight such a ticker/date by chunk (k1² + k2² instead of (k1 + k2)²
+    # copies), since matching them exactly would mean keeping every ticker/date.
+
+    def __init__(self, strategies=None):
+        self.strategies = strategies
+        self._interval_sums = {}
+        self._ticker_ev = None
+        self._grade_ev = None
+        self._cap_ev = None
+
+    def add(self, trades, results):
+        # trades: one trade-list chunk; results: its result rows (result_columns)
+        multi_strategy = "Strategy" in results.columns
+        results = results.drop_duplicates(subset=["Ticker", "Interval", "Date"] + (["Strategy"] if multi_strategy else []))
+        results = results.merge(trades[["Ticker", "Date"]], on=["Ticker", "Date"], how="left")
+
+        value_columns = [column for column, _ in INTERVAL_SUMMARY_COLUMNS.values()]
+        for name in self.strategies if multi_strategy else [None]:
+            rows = results[results["Strategy"] == name] if multi_strategy else results
+            by_interval = rows.groupby("Interval")[value_columns]
+            interval_sums = by_interval.sum().assign(_count=by_interval.size())
+            self._interval_sums[name] = _accumulate(self._interval_sums.get(name), interval_sums)
+
+        primary = results[results["Strategy"] == self.strategies[0]] if multi_strategy else results
+        self._ticker_ev = _accumulate(self._ticker_ev, _sum_count(primary, ["Ticker", "Interval"]))
+        cap_grade_df = _cap_grade_rows(primary, trades)
+        self._grade_ev = _accumulate(self._grade_ev, _sum_count(cap_grade_df, "Grade"))
+        self._cap_ev = _accumulate(self._cap_ev, _sum_count(cap_grade_df, "Cap"))
+
+    def tables(self):
+        # -> interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary
+        # (interval/ticker/cap/grade of the first strategy, as in build_report_tables)
+        primary = self.strategies[0] if self.strategies and len(self.strategies) > 1 else None
+        interval_summary = _interval_table(self._interval_sums.get(primary))
+
+        if self._ticker_ev is None or self._ticker_ev.empty:
+            pivot = pd.DataFrame(index=pd.Index([], name="Ticker"))
+        else:
+            pivot = _mean(self._ticker_ev, ["Ticker", "Interval"]).unstack("Interval")
+        pivot.columns.name = "Interval"
+        pivot_df = pivot.reset_index()
+        pivot_df_chart = pivot[sorted(pivot.columns, key=interval_to_timedelta)].reset_index()
+
+        grade_summary = _mean(self._grade_ev, "Grade").rename("Avg EV by Grade").reset_index()
+        cap_summary = _mean(self._cap_ev, "Cap").rename("Avg EV by Cap").reset_index()
+        return interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary
+
+    def strategy_summary(self):
+        # summarize_strategies over every strategy (None for single-strategy runs)
+        if not self.strategies or len(self.strategies) < 2:
+            return None
+        return summarize_strategies({name: _interval_table(self._interval_sums.get(name)) for name in self.strategies})
+
+
+def _interval_table(sums):
+    # Running interval sums -> summarize_intervals' table
+    if sums is None or sums.empty:
+        return pd.DataFrame(columns=["Interval"] + list(INTERVAL_SUMMARY_COLUMNS))
+    interval_summary = pd.DataFrame({
+        name: sums[column] if how == "sum" else sums[column] / sums["_count"]
+        for name, (column, how) in INTERVAL_SUMMARY_COLUMNS.items()
+    }).rename_axis("Interval").reset_index()
+    interval_summary = interval_summary.round({"Avg EV": 2, "Avg Risk/Reward": 2, "Avg EV/AVG RISK": 2})
+    sort_key = interval_summary["Interval"].map(interval_to_timedelta)
+    return interval_summary.iloc[sort_key.argsort(kind="stable")]
+
+
+def _sum_count(df, keys):
+    return df.groupby(keys)["EV"].agg(["sum", "count"])
+
+
+def _accumulate(total, part):
+    return part if total is None else total.add(part, fill_value=0)
+
+
+def _mean(sum_count, keys):
+    # Groups that only ever saw NaN EVs have count 0 -> NaN, like mean()
+    if sum_count is None:
+        return pd.Series(dtype="float64", index=pd.Index([], name=keys))
+    return sum_count["sum"] / sum_count["count"].where(sum_count["count"] > 0)
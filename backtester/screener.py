@@ -0,0 +1,168 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backtester.analyze import NS_PER_DAY, _time_of_day_ns
+from backtester.tradeList import TRADE_LIST_COLUMNS
+from marketData.marketCalendar import market_holidays
+
+# Universe screen for capitulation days over the bars kept in a BarStore.
+# Every stored ticker/date gets its regular-session features in one pass of
+# array operations over a batch of tickers, the days passing the filters
+# are ranked, and the ranked days become a trade list backtest_multiple_trades
+# reads (Ticker, Date, Grade, Cap; no header).
+
+# Regular session the day's open/high/low/close/volume are taken from
+SCREEN_SESSION = ("09:30", "16:00")
+# Tickers loaded and screened together; bounds memory, not results
+SCREEN_TICKER_BATCH = 200
+# Prior stored days averaged for the volume surge, and the fewest accepted
+VOLUME_LOOKBACK_DAYS = 20
+VOLUME_MIN_DAYS = 5
+
+# Default filters: drop from the running high of day as deep as the
+# strategies' capitulation threshold, day volume twice its recent average
+MIN_DROP_FROM_HIGH = 0.10
+MIN_VOLUME_SURGE = 2.0
+MIN_PRICE = 1.0
+
+# Ranked candidates are graded by score thirds
+GRADES = ("A", "B", "C")
+
+FEATURE_COLUMNS = ["open", "high", "low", "close", "volume", "drop_from_high", "prev_close", "gap", "avg_volume",
+                   "volume_surge"]
+
+
+def daily_features(ticker_bars, session=SCREEN_SESSION):
+    # ticker_bars: [(ticker, bar arrays of its stored days back to back)] ->
+    # one row per ticker/date with the session's OHLCV, the deepest drop from
+    # the running high of day, the gap from the prior day's close and the
+    # volume against the average of the prior stored days. All tickers are
+    # handled by the same flat array operations; days are segments of them.
+    ticker_bars = [(ticker, bars) for ticker, bars in ticker_bars if bars is not None and len(bars["time"])]
+    if not ticker_bars:
+        return _empty_days()
+    ticker_index = np.concatenate([np.full(len(bars["time"]), k) for k, (_, bars) in enumerate(ticker_bars)])
+    flat = {name: np.concatenate([bars[name] for _, bars in ticker_bars])
+            for name in ("time", "open", "high", "low", "close", "volume")}
+
+    time_of_day = np.mod(flat["time"], NS_PER_DAY)
+    in_session = (time_of_day >= _time_of_day_ns(session[0])) & (time_of_day < _time_of_day_ns(session[1]))
+    flat = {name: column[in_session] for name, column in flat.items()}
+    ticker_index = ticker_index[in_session]
+    if not len(ticker_index):
+        return _empty_days()
+
+    # Bars are in time order per ticker, so each ticker/day is one run of rows
+    day = flat["time"] // NS_PER_DAY
+    new_segment = np.ones(len(day), dtype=bool)
+    new_segment[1:] = (day[1:] != day[:-1]) | (ticker_index[1:] != ticker_index[:-1])
+    starts = np.flatnonzero(new_segment)
+    ends = np.append(starts[1:], len(day))
+    segment = np.cumsum(new_segment) - 1
+
+    running_high = pd.Series(flat["high"]).groupby(segment).cummax().to_numpy()
+    drop = np.maximum.reduceat((running_high - flat["low"]) / running_high, starts)
+
+    days = pd.DataFrame({
+        "Ticker": [ticker_bars[k][0] for k in ticker_index[starts]],
+        "Date": day[starts].astype("datetime64[D]"),
+        "open": flat["open"][starts],
+        "high": np.maximum.reduceat(flat["high"], starts),
+        "low": np.minimum.reduceat(flat["low"], starts),
+        "close": flat["close"][ends - 1],
+        "volume": np.add.reduceat(flat["volume"], starts),
+        "drop_from_high": drop,
+    })
+
+    # Prior stored day of the same ticker (rows are sorted by ticker, date)
+    position = days.groupby("Ticker", sort=False).cumcount().to_numpy()
+    has_prev = position > 0
+    prev_close = np.where(has_prev, np.roll(days["close"].to_numpy(), 1), np.nan)
+    prev_date = np.roll(days["Date"].to_numpy(), 1).astype("datetime64[D]")
+    # Gaps only count from the previous trading day (only a weekend or a
+    # market holiday between)
+    dates = days["Date"].to_numpy().astype("datetime64[D]")
+    holidays = market_holidays(dates.min(), dates.max())
+    consecutive = has_prev & (np.busday_count(prev_date + 1, dates, holidays=holidays) == 0)
+    days["prev_close"] = np.where(consecutive, prev_close, np.nan)
+    days["gap"] = days["open"] / days["prev_close"] - 1
+
+    # Mean volume of up to VOLUME_LOOKBACK_DAYS prior stored days, from a running sum
+    lookback = np.minimum(position, VOLUME_LOOKBACK_DAYS)
+    running = np.concatenate(([0.0], np.cumsum(days["volume"].to_numpy())))
+    rows = np.arange(len(days))
+    prior_sum = running[rows] - running[rows - lookback]
+    days["avg_volume"] = np.where(lookback >= VOLUME_MIN_DAYS, prior_sum / np.maximum(lookback, 1), np.nan)
+    days["volume_surge"] = days["volume"] / days["avg_volume"]
+    return days
+
+
+def _empty_days():
+    columns = {"Ticker": pd.Series(dtype=object), "Date": pd.Series(dtype="datetime64[ns]")}
+    columns.update({name: pd.Series(dtype="float64") for name in FEATURE_COLUMNS})
+    return pd.DataFrame(columns)
+
+
+def rank_candidates(days, min_drop=MIN_DROP_FROM_HIGH, min_volume_surge=MIN_VOLUME_SURGE, min_price=MIN_PRICE,
+                    caps=None, max_candidates=None):
+    # Days passing the filters, best first. score is the mean percentile of
+    # drop from high, volume surge and gap size among the candidates; Grade
+    # is its third (A best) and Cap comes from caps ({ticker: cap}), else "Unknown".
+    passed = (days["drop_from_high"] >= min_drop) & (days["volume_surge"] >= min_volume_surge) & (days["close"] >= min_price)
+    candidates = days[passed].copy()
+    ranks = [candidates["drop_from_high"].rank(pct=True), candidates["volume_surge"].rank(pct=True),
+             candidates["gap"].abs().rank(pct=True).fillna(0)]
+    candidates["score"] = sum(ranks) / len(ranks)
+    candidates = candidates.sort_values(["score", "drop_from_high"], ascending=False, kind="stable")
+    if max_candidates is not None:
+        candidates = candidates.head(max_candidates)
+    thirds = np.arange(len(candidates)) * len(GRADES) // max(len(candidates), 1)
+    candidates["Grade"] = [GRADES[k] for k in thirds]
+    candidates["Cap"] = candidates["Ticker"].map(caps or {}).fillna("Unknown")
+    return candidates.reset_index(drop=True)
+
+
+def screen_universe(bar_store, interval, tickers=None, start_date=None, end_date=None, batch_size=SCREEN_TICKER_BATCH,
+                    **filters):
+    # Screens every stored day of the tickers (all tickers stored for the
+    # interval by default) in [start_date, end_date] -> ranked candidates
+    tickers = bar_store.tickers(interval) if tickers is None else list(tickers)
+    start_date = str(start_date) if start_date else "0000-01-01"
+    end_date = str(end_date) if end_date else "9999-12-31"
+    batches = []
+    for offset in range(0, len(tickers), batch_size):
+        batch = tickers[offset:offset + batch_size]
+        ticker_bars = [(ticker, bar_store.get_range(ticker, interval, start_date, end_date)[1]) for ticker in batch]
+        batches.append(daily_features(ticker_bars))
+        # Each ticker is read once; unmap it rather than hold its files open
+        for ticker in batch:
+            bar_store.release(ticker, interval)
+        print(f"Screened {min(offset + batch_size, len(tickers))}/{len(tickers)} tickers")
+    days = pd.concat(batches, ignore_index=True) if batches else daily_features([])
+    return days, rank_candidates(days, **filters)
+
+
+def read_caps(path):
+    # Ticker -> Cap from a header-less two-column file (.csv or .xlsx)
+    if os.path.splitext(path)[1].lower() == ".csv":
+        caps = pd.read_csv(path, header=None, usecols=range(2), names=["Ticker", "Cap"], dtype=str)
+    else:
+        caps = pd.read_excel(path, header=None, usecols=range(2), names=["Ticker", "Cap"], dtype=str)
+    return dict(zip(caps["Ticker"], caps["Cap"]))
+
+
+def write_screened_trade_list(candidates, output_path):
+    # Trade list in the backtest's input format, plus the ranked features
+    # next to it (<name>_screen.csv)
+    trade_list = candidates[TRADE_LIST_COLUMNS]
+    if os.path.splitext(output_path)[1].lower() == ".csv":
+        trade_list.assign(Date=trade_list["Date"].dt.strftime("%Y-%m-%d")).to_csv(output_path, header=False, index=False)
+    else:
+        with pd.ExcelWriter(output_path, engine="xlsxwriter", datetime_format="yyyy-mm-dd") as writer:
+            trade_list.to_excel(writer, header=False, index=False)
+    features_path = f"{os.path.splitext(output_path)[0]}_screen.csv"
+    candidates[TRADE_LIST_COLUMNS + ["score"] + FEATURE_COLUMNS].to_csv(features_path, index=False)
+    return features_path
@@ -0,0 +1,44 @@
+import os
+import sys
+from functools import partial
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backtester.analyze import compute_bar_features, run_trailing_stop_strategy
+
+# Strategy registry. Every strategy takes the shared features of one unit
+# (analyze.compute_bar_features) and returns the stats dict of the array
+# engine (pnl, EV, ..., events):
+#   run(features, start_time, end_time, **params) -> stats
+# Add a strategy with a line below, or register_strategy(name, run) at import
+# time of a module (so backtest worker processes see it too).
+STRATEGIES = {
+    # The original capitulation short: stop at the high of day, trailed down to the prior bar's high
+    "capitulation_short": partial(run_trailing_stop_strategy, side="short", trail=True),
+    # Same entries, stop left at the high of day
+    "capitulation_short_fixed_stop": partial(run_trailing_stop_strategy, side="short", trail=False),
+    # Mirror image: long on a break of the prior bar's high, stop at the low of day trailed up
+    "reversal_long": partial(run_trailing_stop_strategy, side="long", trail=True),
+    "reversal_long_fixed_stop": partial(run_trailing_stop_strategy, side="long", trail=False),
+}
+
+DEFAULT_STRATEGY = "capitulation_short"
+
+
+def register_strategy(name, run):
+    STRATEGIES[name] = run
+
+
+def check_strategies(names):
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {unknown}, expected some of {sorted(STRATEGIES)}")
+    if not names:
+        raise ValueError("No strategies selected")
+    return list(names)
+
+
+def run_strategies(bars, strategies=(DEFAULT_STRATEGY,), start_time="09:30", end_time="16:00",
+                   session_start="04:00", session_end="20:00", **params):
+    # -> {strategy name: stats}; the features are computed once and shared
+    features = compute_bar_features(bars, session_start, session_end)
+    return {name: STRATEGIES[name](features, start_time, end_time, **params) for name in strategies}
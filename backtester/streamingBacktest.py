@@ -0,0 +1,286 @@
+import os
+import sys
+import traceback
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from marketData.fetchPipeline import iter_fetched_bars
+from marketData.dataSource import open_data_source
+from marketData.asyncFetch import FETCH_DEADLINE_SEC, FETCH_RETRIES
+from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS, _today_eastern
+from marketData.barStore import BarStore
+from marketData.tickCache import TickCache
+from backtester.analyze import TRADE_EVENT_COLUMNS
+from backtester.batchBacktest import (UNITS_PER_WORKER_BATCH, build_result_row, day_tick_arrays, strategy_store_params,
+                                      unit_arrays)
+from backtester.export import RAW_COLUMNS, TableAppender, write_summary_workbook
+from backtester.parallelExecutor import UnitExecutor
+from backtester.resultStore import ResultStore, bars_to_frame
+from backtester.resultsEngine import StreamingSummary, result_columns
+from backtester.strategies import DEFAULT_STRATEGY, check_strategies
+from backtester.tradeList import STREAM_CHUNK_ROWS, iter_trade_list
+from runMetrics import METRICS
+
+# Ticker lines overlaid on the summary chart of a streamed run
+SUMMARY_CHART_TICKERS = 50
+
+STREAM_TABLES = ("trade_results", "raw_bars", "trade_events", "failed_units")
+FAILURE_COLUMNS = ["Ticker", "Date", "Interval", "Stage", "Error"]
+
+
+class _StreamSinks:
+    # The table files of a streamed run plus the rows waiting to be appended.
+    # Rows are flushed after every strategy batch, so at most one batch of
+    # raw bars is in memory at a time.
+
+    def __init__(self, base, fmt, strategies):
+        self.strategies = strategies
+        self.key_columns = ["Ticker", "Date", "Interval"] + (["Strategy"] if len(strategies) > 1 else [])
+        self.appenders = {}
+        try:
+            for name in STREAM_TABLES:
+                self.appenders[name] = TableAppender(f"{base}_{name}.{fmt}", fmt)
+        except Exception:
+            self.close()
+            raise
+        self.results = []
+        self.raw_frames = []
+        self.event_frames = []
+        self.failures = []
+
+    def add_unit(self, ticker, date, interval, strategy, result, events, df_raw):
+        # df_raw is only given once per unit (with the first strategy)
+        keys = {"Ticker": ticker, "Date": date, "Interval": interval}
+        if df_raw is not None:
+            self.raw_frames.append(df_raw.assign(**keys))
+        if "Strategy" in self.key_columns:
+            keys["Strategy"] = strategy
+            result = {**result, "Strategy": strategy}
+        self.results.append(result)
+        events_df = pd.DataFrame({column: events[column] for column in TRADE_EVENT_COLUMNS})
+        if len(events_df):
+            events_df["time"] = pd.to_datetime(np.asarray(events_df["time"], dtype="int64"))
+            self.event_frames.append(events_df.assign(**keys))
+
+    def add_stored_unit(self, store, ticker, date, interval):
+        for name in self.strategies:
+            self.add_unit(ticker, date, interval, name, *store.get(ticker, date, interval, name))
+
+    def add_failure(self, ticker, date, interval, stage, error):
+        METRICS.count("units.failed_recorded")
+        self.failures.append((ticker, date, interval, stage, str(error)))
+
+    def flush_units(self):
+        if self.raw_frames:
+            raw_bars = pd.concat(self.raw_frames, ignore_index=True)
+            self.appenders["raw_bars"].append(raw_bars[["Ticker", "Date", "Interval"] + RAW_COLUMNS])
+        if self.event_frames:
+            events = pd.concat(self.event_frames, ignore_index=True)
+            events = events[self.key_columns + list(TRADE_EVENT_COLUMNS)]
+            self.appenders["trade_events"].append(events.astype({"price": "float64", "stop": "float64",
+                                                                 "pnl": "float64", "risk": "float64",
+                                                                 "rr": "float64"}))
+        if self.failures:
+            self.appenders["failed_units"].append(pd.DataFrame(self.failures, columns=FAILURE_COLUMNS))
+        self.raw_frames.clear()
+        self.event_frames.clear()
+        self.failures.clear()
+
+    def flush_results(self):
+        # -> this chunk's result rows, after appending them to the results table
+        self.flush_units()
+        results = pd.DataFrame.from_records(self.results, columns=result_columns(self.strategies))
+        self.appenders["trade_results"].append(results)
+        self.results = []
+        return results
+
+    def close(self):
+        for appender in self.appenders.values():
+            appender.close()
+
+
+def _run_stream_batch(executor, pending, store, today, sinks):
+    # Same as batchBacktest.run_pending_units, but every unit also goes
+    # straight to the table files
+    with METRICS.stage("strategy"):
+        outcomes = executor.map([bars for _, _, _, bars in pending])
+    with METRICS.stage("store.checkpoint"):
+        for (ticker, date, interval, bars), (stats_by_strategy, error) in zip(pending, outcomes):
+            if error is not None:
+                print(f" → Error processing {ticker}, {date}, {interval}: {error.splitlines()[0]}")
+                METRICS.count("units.failed")
+                sinks.add_failure(ticker, date, interval, "strategy", error.splitlines()[0])
+                if store is not None:
+                    store.record_failure(ticker, date, interval, "strategy", error.splitlines()[0])
+                continue
+            for name in sinks.strategies:
+                stats = stats_by_strategy[name]
+                primary = name == sinks.strategies[0]
+                result = build_result_row(ticker, date, interval, stats)
+                if store is not None:
+                    store.put(ticker, date, interval, result, stats["events"], bars if primary else None,
+                              complete=date < today, strategy=name)
+                sinks.add_unit(ticker, date, interval, name, result, stats["events"],
+                               bars_to_frame(bars) if primary else None)
+            METRICS.count("units.computed")
+        if store is not None:
+            store.commit()
+    with METRICS.stage("export.stream"):
+        sinks.flush_units()
+    pending.clear()
+
+
+def backtest_trade_stream(trade_list_path, intervals, start_time, end_time, output_path,
+                          chunk_rows=STREAM_CHUNK_ROWS, table_format="csv", cache_dir=None, cache_max_mb=2048,
+                          fetch_workers=4, backtest_workers=1, result_store=None, data_source="shel", record_dir=None,
+                          write_run_report=True, fetch_deadline=FETCH_DEADLINE_SEC, fetch_retries=FETCH_RETRIES,
+                          strategies=(DEFAULT_STRATEGY,), fill_mode="bar", bar_store_dir=None, fetch_range_days=1):
+    # Runs a trade list of any length with flat memory: the list is read
+    # chunk_rows rows at a time and every finished unit is appended to
+    # <output base>_{trade_results,raw_bars,trade_events,failed_units}.<table_format>.
+    # The summary sheets are built from running totals and written to
+    # output_path at the end. Nothing is kept in memory between chunks, so
+    # result_store (when given) is the only way finished units are reused.
+    METRICS.reset()
+    base = os.path.splitext(output_path)[0]
+    try:
+        strategies = check_strategies(strategies)
+        store_params = strategy_store_params(start_time, end_time, fill_mode)
+    except ValueError as e:
+        print(str(e))
+        return
+    try:
+        sinks = _StreamSinks(base, table_format, strategies)
+    except (ImportError, ValueError) as e:
+        print(f"Cannot write {table_format} tables: {e}")
+        return
+
+    cache = TickCache(cache_dir, cache_max_mb) if cache_dir else None
+    bar_store = BarStore(bar_store_dir, (EXCLUDED_FLAGS, EXCLUDED_MARKETS)) if bar_store_dir else None
+    store = None
+    if result_store:
+        store = ResultStore(result_store, store_params, strategies)
+    today = _today_eastern().strftime("%Y-%m-%d")
+    executor = UnitExecutor(backtest_workers, {"start_time": start_time, "end_time": end_time, "strategies": strategies})
+    batch_size = executor.workers * UNITS_PER_WORKER_BATCH
+    source = open_data_source(data_source, record_dir, fetch_workers, fetch_deadline, fetch_retries)
+    summary = StreamingSummary(strategies)
+    n_rows = 0
+
+    try:
+        for chunk in iter_trade_list(trade_list_path, chunk_rows):
+            n_rows += len(chunk)
+            METRICS.count("trade_list.rows", len(chunk))
+            print(f"\nTrade list rows {chunk.index[0]}-{chunk.index[-1]}")
+            with METRICS.stage("stream.chunk"):
+                _run_chunk(chunk, intervals, executor, batch_size, source, cache, store, today, sinks, fetch_workers,
+                           fill_mode == "tick", bar_store, fetch_range_days)
+                with METRICS.stage("export.stream"):
+                    results = sinks.flush_results()
+                with METRICS.stage("report.tables"):
+                    summary.add(chunk, results)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Streamed run stopped: {str(e)}")
+        return
+    finally:
+        executor.close()
+        source.close()
+        if bar_store is not None:
+            bar_store_stats = bar_store.stats()
+            bar_store.close()
+        sinks.close()
+        if store is not None:
+            store.close()
+
+    for timing in executor.timing_report():
+        print(f"Backtest worker {timing['worker']}: {timing['units']} units in {timing['seconds']}s ({timing['units_per_sec']} units/s)")
+    for seconds in executor.unit_seconds:
+        METRICS.observe("strategy.unit", seconds)
+    if cache is not None:
+        print(f"Tick cache stats: {cache.stats()}")
+    if bar_store is not None:
+        print(f"Bar store stats: {bar_store_stats}")
+
+    with METRICS.stage("export.workbook"):
+        interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary = summary.tables()
+        write_summary_workbook(output_path, interval_summary, pivot_df, pivot_df_chart, grade_summary, cap_summary,
+                               overlay_tickers=SUMMARY_CHART_TICKERS, strategy_summary=summary.strategy_summary())
+
+    for name, appender in sinks.appenders.items():
+        print(f"Wrote {appender.rows} rows to {appender.path}" if appender.rows else f"No rows for {name}")
+
+    if write_run_report:
+        report_path = f"{base}_run_report.json"
+        METRICS.write_json(
+            report_path,
+            config={"intervals": list(intervals), "start_time": start_time, "end_time": end_time,
+                    "fetch_workers": fetch_workers, "backtest_workers": executor.workers, "data_source": data_source,
+                    "fetch_deadline": fetch_deadline, "fetch_retries": fetch_retries, "stream_chunk_rows": chunk_rows,
+                    "table_format": table_format, "strategies": strategies, "fill_mode": fill_mode,
+                    "fetch_range_days": fetch_range_days},
+            trade_list_rows=n_rows,
+            backtest_workers=executor.timing_report(),
+            tables={name: {"path": appender.path, "rows": appender.rows} for name, appender in sinks.appenders.items()},
+            tick_cache=cache.stats() if cache is not None else None,
+            bar_store=bar_store_stats if bar_store is not None else None,
+        )
+        print(f"Run report saved to '{report_path}'")
+
+    print(f"All done! Summary saved to '{output_path}'")
+
+
+def _run_chunk(chunk, intervals, executor, batch_size, source, cache, store, today, sinks, fetch_workers, keep_ticks,
+               bar_store, range_days):
+    jobs = []
+    seen = set()
+    for idx, ticker, date in zip(chunk.index, chunk["Ticker"], chunk["Date"]):
+        if pd.isna(date):
+            print(f"Skipping invalid date for Ticker {ticker} at row {idx}")
+            continue
+        if (ticker, date) in seen:
+            continue
+        seen.add((ticker, date))
+        if store is not None and all(store.has(ticker, date, interval) for interval in intervals):
+            METRICS.count("units.reused", len(intervals))
+            for interval in intervals:
+                sinks.add_stored_unit(store, ticker, date, interval)
+            continue
+        jobs.append((idx, ticker, date))
+
+    pending = []
+    for idx, bars_by_interval, fetch_error in iter_fetched_bars(jobs, intervals, workers=fetch_workers, cache=cache,
+                                                                data_source=source, keep_ticks=keep_ticks,
+                                                                bar_store=bar_store, range_days=range_days):
+        ticker = chunk.at[idx, "Ticker"]
+        date = chunk.at[idx, "Date"]
+        if fetch_error is not None:
+            print(f" → Error fetching {ticker}, {date}: {str(fetch_error)}")
+            METRICS.count("fetch.failed_days")
+            for interval in intervals:
+                sinks.add_failure(ticker, date, interval, "fetch", fetch_error)
+                if store is not None:
+                    store.record_failure(ticker, date, interval, "fetch", fetch_error)
+            continue
+
+        tick_arrays = day_tick_arrays(bars_by_interval)
+        for interval in intervals:
+            if store is not None and store.has(ticker, date, interval):
+                METRICS.count("units.reused")
+                sinks.add_stored_unit(store, ticker, date, interval)
+                continue
+            try:
+                df = bars_by_interval[interval]
+                if df.empty:
+                    METRICS.count("units.no_data")
+                    sinks.add_failure(ticker, date, interval, "no_data", "no trades to build bars from")
+                    continue
+                pending.append((ticker, date, interval, unit_arrays(df, tick_arrays)))
+            except Exception as e:
+                print(f" → Error processing {ticker}, {date}, {interval}: {str(e)}")
+                print(f" → Stack trace: {traceback.format_exc()}")
+                sinks.add_failure(ticker, date, interval, "bars", e)
+
+        if len(pending) >= batch_size:
+            _run_stream_batch(executor, pending, store, today, sinks)
+    _run_stream_batch(executor, pending, store, today, sinks)
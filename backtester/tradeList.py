@@ -0,0 +1,72 @@
+import os
+import pandas as pd
+
+# Trade lists have no header row: Ticker, Date, Grade, Cap
+TRADE_LIST_COLUMNS = ["Ticker", "Date", "Grade", "Cap"]
+
+# Rows per chunk when a trade list is streamed instead of read whole
+STREAM_CHUNK_ROWS = 5000
+
+
+def normalize_trade_dates(values):
+    # Dates as YYYY-MM-DD strings (NaN when unreadable). Excel date cells and
+    # mm/dd/yy text are read as before; YYYY-MM-DD text (CSV/Parquet lists)
+    # is accepted too
+    dates = pd.to_datetime(values, format='%m/%d/%y', errors='coerce')
+    dates = dates.fillna(pd.to_datetime(values, format='%Y-%m-%d', errors='coerce'))
+    return dates.dt.strftime("%Y-%m-%d")
+
+
+def iter_trade_list(path, chunk_rows=STREAM_CHUNK_ROWS):
+    # Yields the trade list as DataFrames of at most chunk_rows rows, with
+    # the same columns and date format as read_trade_list. The index keeps
+    # counting across chunks, so it is the row number in the whole file.
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        chunks = pd.read_csv(path, header=None, names=TRADE_LIST_COLUMNS, usecols=range(4), chunksize=chunk_rows,
+                             dtype=str, keep_default_na=False, na_values=[""])
+    elif ext in (".parquet", ".pq"):
+        chunks = _iter_parquet(path, chunk_rows)
+    elif ext in (".xlsx", ".xlsm"):
+        chunks = _iter_xlsx(path, chunk_rows)
+    else:
+        raise ValueError(f"Unsupported trade list format '{ext}', expected .csv, .parquet or .xlsx")
+
+    start = 0
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        chunk.index += start
+        start += len(chunk)
+        chunk["Date"] = normalize_trade_dates(chunk["Date"])
+        yield chunk
+
+
+def _iter_parquet(path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    # Named columns when the file has them, otherwise the first four in order
+    columns = TRADE_LIST_COLUMNS if set(TRADE_LIST_COLUMNS) <= set(names) else names[:4]
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk = batch.to_pandas()
+        chunk.columns = TRADE_LIST_COLUMNS
+        yield chunk
+
+
+def _iter_xlsx(path, chunk_rows):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of loading it whole
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        for values in workbook.worksheets[0].iter_rows(max_col=4, values_only=True):
+            rows.append((tuple(values) + (None,) * 4)[:4])
+            if len(rows) == chunk_rows:
+                yield pd.DataFrame(rows, columns=TRADE_LIST_COLUMNS)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=TRADE_LIST_COLUMNS)
+    finally:
+        workbook.close()
@@ -1,8 +0,0 @@
-def resample_to_interval(df, minutes):
-    return df.resample(f"{minutes}min").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum"
-    }).dropna()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from marketData.syntheticTicks import generate_trades, iter_trade_messages
+from marketData.tickBuffer import TickBuffer
+from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS, buffer_to_ticks
+from marketData.barBuilder import build_bars_multi
+from backtester.analyze import bars_to_arrays, run_capitulation_short_strategy_arrays, run_capitulation_short_strategy_with_metrics
+from backtester.batchBacktest import build_result_row
+from backtester.resultsEngine import build_report_tables
+from backtester.export import write_workbook
+
+# Throughput benchmark on synthetic SHEL days (no credentials needed):
+#   python3 benchmark.py                      compare against the stored baseline
+#   python3 benchmark.py --update-baseline    store this machine's numbers
+# Exits with status 1 when a stage is slower than its baseline by more than
+# REGRESSION_TOLERANCE.
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarkBaseline.json")
+REGRESSION_TOLERANCE = 0.25
+
+PROFILES = {
+    "quick": {"days": 3, "ticks_per_day": 50_000},
+    "default": {"days": 6, "ticks_per_day": 200_000},
+}
+INTERVALS = ["1min", "5min", "10min", "15min", "30min"]
+START_TIME = "09:30"
+END_TIME = "16:00"
+
+
+class StageTimer:
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    @contextlib.contextmanager
+    def measure(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.wall += time.perf_counter() - wall
+            self.cpu += time.process_time() - cpu
+
+
+def synthetic_trade_list(days):
+    dates = pd.bdate_range("2024-06-03", periods=days).strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "Ticker": [f"SYN{i}" for i in range(days)],
+        "Date": list(dates),
+        "Grade": [("A", "B", "C")[i % 3] for i in range(days)],
+        "Cap": [("micro", "small", "Medium", "large")[i % 4] for i in range(days)],
+    })
+
+
+def run_benchmark(days, ticks_per_day):
+    trades = synthetic_trade_list(days)
+    timers = {name: StageTimer() for name in ("ingest", "bar_build", "strategy_metrics", "strategy_arrays", "export")}
+    n_messages = 0
+    n_ticks = 0
+    n_units = 0
+    n_bars = 0
+
+    all_results = []
+    raw_data_sheets = {}
+    trade_events = {}
+    quiet = io.StringIO()
+
+    for ticker, date in zip(trades["Ticker"], trades["Date"]):
+        # Messages are built up front so only the callback + cleanup is timed
+        messages = list(iter_trade_messages(generate_trades(ticker, date, n_ticks=ticks_per_day), ticker))
+        n_messages += len(messages)
+
+        with timers["ingest"].measure():
+            buffer = TickBuffer(EXCLUDED_FLAGS, EXCLUDED_MARKETS)
+            for message in messages:
+                buffer.collect(message)
+            ticks = buffer_to_ticks(buffer, ticker, date)
+        del messages
+        n_ticks += len(ticks["time"])
+
+        with timers["bar_build"].measure():
+            bars_by_interval = build_bars_multi(ticks, date, INTERVALS)
+
+        for interval in INTERVALS:
+            df = bars_by_interval[interval]
+            n_units += 1
+            n_bars += len(df)
+
+            with timers["strategy_metrics"].measure(), contextlib.redirect_stdout(quiet):
+                run_capitulation_short_strategy_with_metrics(df.copy(), START_TIME, END_TIME)
+
+            with timers["strategy_arrays"].measure():
+                stats = run_capitulation_short_strategy_arrays(bars_to_arrays(df), START_TIME, END_TIME)
+
+            df_raw = df.reset_index()
+            df_raw.rename(columns={df_raw.columns[0]: 'timestamp'}, inplace=True)
+            raw_data_sheets[f"{ticker}_{interval}"] = df_raw
+            trade_events[f"{ticker}_{interval}"] = stats["events"]
+            all_results.append(build_result_row(ticker, date, interval, stats))
+
+    with tempfile.TemporaryDirectory() as tmp, timers["export"].measure(), contextlib.redirect_stdout(quiet):
+        tables = build_report_tables(all_results, trades)
+        write_workbook(os.path.join(tmp, "benchmark.xlsx"), raw_data_sheets, trade_events, *tables)
+
+    def rate(count, seconds):
+        return round(count / seconds, 1) if seconds else None
+
+    metrics = {
+        "ingest": {"ticks_per_sec": rate(n_messages, timers["ingest"].wall)},
+        "bar_build": {"ticks_per_sec": rate(n_ticks, timers["bar_build"].wall),
+                      "units_per_sec": rate(n_units, timers["bar_build"].wall)},
+        "strategy_metrics": {"units_per_sec": rate(n_units, timers["strategy_metrics"].wall),
+                             "bars_per_sec": rate(n_bars, timers["strategy_metrics"].wall)},
+        "strategy_arrays": {"units_per_sec": rate(n_units, timers["strategy_arrays"].wall),
+                            "bars_per_sec": rate(n_bars, timers["strategy_arrays"].wall)},
+        "export": {"units_per_sec": rate(n_units, timers["export"].wall)},
+    }
+    for name, timer in timers.items():
+        metrics[name]["wall_sec"] = round(timer.wall, 4)
+        metrics[name]["cpu_sec"] = round(timer.cpu, 4)
+    return metrics
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as f:
+        return json.load(f)
+
+
+def compare(metrics, baseline):
+    # Only throughput numbers are compared; higher is better
+    regressions = []
+    print(f"{'stage':<18}{'metric':<16}{'current':>14}{'baseline':>14}{'ratio':>8}")
+    for stage, values in metrics.items():
+        for metric, value in values.items():
+            if not metric.endswith("_per_sec"):
+                continue
+            base = baseline.get(stage, {}).get(metric)
+            ratio = value / base if base and value else None
+            flag = ""
+            if ratio is not None and ratio < 1 - REGRESSION_TOLERANCE:
+                flag = "  REGRESSION"
+                regressions.append(f"{stage}.{metric}")
+            print(f"{stage:<18}{metric:<16}{value if value is not None else '-':>14}{base if base else '-':>14}"
+                  f"{f'{ratio:.2f}' if ratio else '-':>8}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic end-to-end throughput benchmark")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--update-baseline", action="store_true", help="store these numbers as the profile's baseline")
+    parser.add_argument("--json", help="also write the measured numbers to this file")
+    args = parser.parse_args(argv)
+
+    profile = PROFILES[args.profile]
+    print(f"Benchmark profile '{args.profile}': {profile['days']} days x {profile['ticks_per_day']} ticks, intervals {INTERVALS}")
+    metrics = run_benchmark(profile["days"], profile["ticks_per_day"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(metrics, f, indent=2)
+
+    baselines = load_baselines()
+    regressions = compare(metrics, baselines.get(args.profile, {}).get("metrics", {}))
+
+    if args.update_baseline:
+        baselines[args.profile] = {
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "metrics": metrics,
+        }
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline for '{args.profile}' saved to {BASELINE_FILE}")
+        return 0
+
+    if regressions:
+        print(f"Slower than baseline by more than {REGRESSION_TOLERANCE:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
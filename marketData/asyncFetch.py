@@ -0,0 +1,126 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+
+from marketData.fetchData import is_auth_error
+from marketData.sessionPool import abort_session
+from runMetrics import METRICS
+
+# Per-attempt deadline, retries after the first attempt and the backoff cap
+FETCH_DEADLINE_SEC = 10
+FETCH_RETRIES = 2
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 8.0
+
+# Errors a retry cannot fix (besides failed SHEL logins, see is_auth_error)
+NON_RETRYABLE_ERRORS = (ImportError,)
+
+
+class FetchFailed(Exception):
+    # Raised for a ticker/date once every attempt has failed
+    pass
+
+
+class FetchAttempt:
+    # Links the coroutine that owns an attempt's deadline with the thread
+    # doing the blocking download, so the deadline can abort that thread's
+    # session (which makes handle.wait() return) instead of waiting on it
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self.aborted = False
+
+    def attach(self, session):
+        with self._lock:
+            self._session = session
+            aborted = self.aborted
+        if aborted:
+            abort_session(session)
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            session = self._session
+        if session is not None:
+            abort_session(session)
+
+
+class AsyncFetchSource:
+    # Data source wrapper running every download on one asyncio loop (in a
+    # background thread): at most max_concurrency downloads at a time, a hard
+    # deadline per attempt and jittered exponential backoff between retries.
+    # The wrapped source does the blocking work in an executor thread and
+    # must accept fetch_buffer(ticker, date, attempt) (and fetch_range(ticker,
+    # start, end, attempt) for multi-day requests, which get one deadline per
+    # weekday they cover).
+
+    def __init__(self, source, max_concurrency=4, deadline=FETCH_DEADLINE_SEC, retries=FETCH_RETRIES):
+        self.source = source
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.retries = retries
+        # Extra threads cover aborted downloads that are still unwinding
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="shel-fetch")
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="shel-fetch-loop", daemon=True)
+        self._thread.start()
+
+    def fetch_buffer(self, ticker, date):
+        # Blocking entry point for the fetch pipeline threads
+        return asyncio.run_coroutine_threadsafe(self.fetch(ticker, date), self._loop).result()
+
+    def fetch_range(self, ticker, start, end):
+        return asyncio.run_coroutine_threadsafe(self.fetch(ticker, start, end), self._loop).result()
+
+    async def fetch(self, ticker, date, end=None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        if end is None:
+            request, args, deadline = self.source.fetch_buffer, (ticker, date), self.deadline
+        else:
+            weekdays = max(1, int(np.busday_count(date, end + timedelta(days=1))))
+            request, args, deadline = self.source.fetch_range, (ticker, date, end), self.deadline * weekdays
+            date = f"{date}..{end}"
+        error = None
+        attempts = self.retries + 1
+        for attempt_no in range(1, attempts + 1):
+            if attempt_no > 1:
+                METRICS.count("fetch.retries")
+                await asyncio.sleep(backoff_delay(attempt_no - 1))
+
+            async with self._semaphore:
+                attempt = FetchAttempt()
+                call = loop.run_in_executor(self._executor, request, *args, attempt)
+                try:
+                    return await asyncio.wait_for(call, deadline)
+                except asyncio.TimeoutError:
+                    attempt.abort()
+                    METRICS.count("fetch.timeouts")
+                    error = TimeoutError(f"no reply within {deadline}s")
+                except Exception as e:
+                    METRICS.count("fetch.errors")
+                    if isinstance(e, NON_RETRYABLE_ERRORS) or is_auth_error(e):
+                        raise FetchFailed(f"{ticker} {date}: {e}") from e
+                    error = e
+            print(f"SHEL fetch attempt {attempt_no}/{attempts} failed for {ticker} on {date}: {error}")
+
+        raise FetchFailed(f"{ticker} {date}: gave up after {attempts} attempts, last error: {error}") from error
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=False)
+        self.source.close()
+
+
+def backoff_delay(retry_no):
+    # "Full jitter": uniform in [0, min(cap, base * 2^(n-1))]
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** (retry_no - 1)))
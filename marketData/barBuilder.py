@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400_000_000_000
+
+
+def interval_to_timedelta(interval):
+    # Accepts both pandas aliases ("10min") and SHEL bar names ("bar-10min")
+    return pd.to_timedelta(interval.replace("bar-", ""))
+
+
+def interval_to_ns(interval):
+    return int(interval_to_timedelta(interval).value)
+
+
+def build_bars_multi(ticks, date, intervals):
+    # ticks: {"time", "price", "size"} arrays, time int64 ns sorted and unique.
+    # Produces the same bars as the old reindex + resample().agg() path: bins
+    # anchored at midnight of the first day, prices rounded to 2 decimals and
+    # empty bars dropped (they are simply never created here).
+    times = ticks["time"]
+    if len(times) == 0:
+        return {interval: pd.DataFrame() for interval in intervals}
+
+    # resample() anchored its bins at midnight of the first timestamp, and the
+    # old 04:00-20:00 minute grid always put `date` itself in the index
+    first_day = np.floor_divide(times[0], NS_PER_DAY) * NS_PER_DAY
+    origin = min(int(first_day), pd.Timestamp(date).value)
+
+    # Finest interval comes from ticks, coarser ones roll up from the finest
+    # already-built interval that divides them evenly
+    built = {}
+    for interval in sorted(set(intervals), key=interval_to_ns):
+        freq = interval_to_ns(interval)
+        base = None
+        for finer in sorted(built, key=interval_to_ns, reverse=True):
+            if freq % interval_to_ns(finer) == 0:
+                base = finer
+                break
+        if base is None:
+            built[interval] = _bucket(times, origin, freq, ticks["price"], ticks["price"], ticks["price"],
+                                      ticks["price"], ticks["size"])
+        else:
+            fine = built[base]
+            built[interval] = _bucket(fine["time"], origin, freq, fine["open"], fine["high"], fine["low"],
+                                      fine["close"], fine["volume"])
+
+    return {interval: bars_to_frame(built[interval]) for interval in intervals}
+
+
+def build_bars(ticks, date, interval="15min"):
+    return build_bars_multi(ticks, date, [interval])[interval]
+
+
+def _bucket(times, origin, freq, open_, high, low, close, volume):
+    bucket = (times - origin) // freq
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    ends = np.append(starts[1:], len(times)) - 1
+    return {
+        "time": origin + bucket[starts] * freq,
+        "open": open_[starts],
+        "high": np.maximum.reduceat(high, starts),
+        "low": np.minimum.reduceat(low, starts),
+        "close": close[ends],
+        "volume": np.add.reduceat(volume, starts),
+    }
+
+
+def bars_to_frame(bars):
+    df = pd.DataFrame(
+        {
+            "open": bars["open"].round(2),
+            "high": bars["high"].round(2),
+            "low": bars["low"].round(2),
+            "close": bars["close"].round(2),
+            "volume": bars["volume"].astype("float64"),
+        },
+        index=pd.DatetimeIndex(bars["time"].view("datetime64[ns]")),
+    )
+    return df
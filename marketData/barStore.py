@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Bumped whenever the stored bar layout changes, so old partitions are not reused
+BAR_STORE_VERSION = 1
+
+# On-disk column types: time is whole seconds from midnight of the bar's
+# date, prices are float32 (read back rounded to cents) and volume is shares
+BAR_COLUMNS = {
+    "time": np.dtype("<i4"),
+    "open": np.dtype("<f4"),
+    "high": np.dtype("<f4"),
+    "low": np.dtype("<f4"),
+    "close": np.dtype("<f4"),
+    "volume": np.dtype("<u4"),
+}
+
+# float32 keeps every cent exact (after rounding) below this price
+MAX_PRICE = 65536
+
+NS_PER_SECOND = 1_000_000_000
+
+# Ticker/intervals whose column maps stay open (six files each); the least
+# recently read ones are unmapped, so the open files stay far below ulimit -n
+MAX_OPEN_MAPS = 32
+
+BAR_BUILDER_FILE = os.path.join(os.path.dirname(__file__), "barBuilder.py")
+
+
+class BarStore:
+    # Compact store of built bars for many tickers and years. Every
+    # ticker/interval has one append-only file per column under
+    # <store_dir>/<interval>/<ticker>/, and each ticker/date is a row range
+    # of those files. An SQLite index maps (ticker, interval, date) to its
+    # rows, so date ranges are one index scan. Reads slice memory-mapped
+    # columns and decode them to the bar builder's float64 arrays in one pass
+    # per column (prices rounded back to cents, so results match freshly
+    # built bars); nothing is parsed or unpickled.
+    # Bars depend on the tick filter and the bar builder, both part of the
+    # partition key (source), so changing either starts new partitions.
+
+    def __init__(self, store_dir, filter_key):
+        self.store_dir = store_dir
+        self.source = _source_digest(filter_key)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (ticker, interval) -> (rows mapped, {column: memmap}), least recently used first
+        self._maps = OrderedDict()
+        os.makedirs(store_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(store_dir, "index.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS partitions ("
+            " ticker TEXT, interval TEXT, source TEXT, date TEXT, start_row INTEGER, n_rows INTEGER,"
+            " PRIMARY KEY (ticker, interval, source, date))"
+        )
+        self.conn.commit()
+
+    def _dir(self, ticker, interval):
+        safe_ticker = str(ticker).replace("/", "-").replace(os.sep, "-")
+        return os.path.join(self.store_dir, interval, safe_ticker)
+
+    def _rows(self, ticker, interval, start_date, end_date):
+        return self.conn.execute(
+            "SELECT date, start_row, n_rows FROM partitions"
+            " WHERE ticker=? AND interval=? AND source=? AND date BETWEEN ? AND ? ORDER BY date",
+            (str(ticker), interval, self.source, str(start_date), str(end_date)),
+        ).fetchall()
+
+    def has(self, ticker, date, interval):
+        with self._lock:
+            return bool(self._rows(ticker, interval, date, date))
+
+    def tickers(self, interval):
+        # Tickers with at least one stored day of this interval
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT ticker FROM partitions WHERE interval=? AND source=? ORDER BY ticker",
+                (interval, self.source),
+            ).fetchall()
+        return [ticker for ticker, in rows]
+
+    def get(self, ticker, date, interval):
+        # -> bar arrays like barBuilder builds them (time int64 ns, float64
+        # prices and volume) or None if the ticker/date is not stored
+        with self._lock:
+            rows = self._rows(ticker, interval, date, date)
+            if not rows:
+                self.misses += 1
+                return None
+            self.hits += 1
+            columns = self._columns(ticker, interval, rows[0][1] + rows[0][2])
+        return _decode(columns, [rows[0]])
+
+    def get_range(self, ticker, interval, start_date, end_date):
+        # All stored days of one ticker/interval in [start_date, end_date],
+        # in date order -> (dates, bar arrays of those days back to back)
+        with self._lock:
+            rows = self._rows(ticker, interval, start_date, end_date)
+            if not rows:
+                return [], None
+            columns = self._columns(ticker, interval, max(start + n for _, start, n in rows))
+        return [date for date, _, _ in rows], _decode(columns, rows)
+
+    def put(self, ticker, date, interval, df):
+        # df: the bars of one ticker/date as built by barBuilder. Days that
+        # do not fit the compact types are left out (returns False).
+        encoded = _encode(df, date)
+        if encoded is None:
+            return False
+        with self._lock:
+            if self._rows(ticker, interval, date, date):
+                return True
+            path = self._dir(ticker, interval)
+            os.makedirs(path, exist_ok=True)
+            # Rows past the last indexed partition (an interrupted append)
+            # are never referenced and get overwritten here
+            start_row = self.conn.execute(
+                "SELECT COALESCE(MAX(start_row + n_rows), 0) FROM partitions WHERE ticker=? AND interval=?",
+                (str(ticker), interval),
+            ).fetchone()[0]
+            for name, dtype in BAR_COLUMNS.items():
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.truncate(start_row * dtype.itemsize)
+                    f.write(encoded[name].tobytes())
+            self.conn.execute(
+                "INSERT INTO partitions VALUES (?, ?, ?, ?, ?, ?)",
+                (str(ticker), interval, self.source, str(date), start_row, len(encoded["time"])),
+            )
+            self.conn.commit()
+        return True
+
+    def _columns(self, ticker, interval, rows_needed):
+        # Memory maps of a ticker/interval, reopened once the files have grown
+        key = (str(ticker), interval)
+        mapped = self._maps.get(key)
+        if mapped is not None:
+            self._maps.move_to_end(key)
+        if mapped is None or mapped[0] < rows_needed:
+            path = self._dir(ticker, interval)
+            n_rows = os.path.getsize(os.path.join(path, "time.bin")) // BAR_COLUMNS["time"].itemsize
+            mapped = (n_rows, {
+                name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(n_rows,))
+                for name, dtype in BAR_COLUMNS.items()
+            })
+            self._maps[key] = mapped
+            # Decoded bars are copies, so dropping a map closes its files
+            while len(self._maps) > MAX_OPEN_MAPS:
+                self._maps.popitem(last=False)
+        return mapped[1]
+
+    def release(self, ticker, interval):
+        # Unmaps one ticker/interval's columns (reopened on the next read)
+        with self._lock:
+            self._maps.pop((str(ticker), interval), None)
+
+    def stats(self):
+        with self._lock:
+            partitions, bars = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(n_rows), 0) FROM partitions WHERE source=?", (self.source,)
+            ).fetchone()
+        size = 0
+        for root, _, files in os.walk(self.store_dir):
+            size += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(".bin"))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "partitions": partitions,
+            "bars": bars,
+            "size_mb": round(size / (1024 * 1024), 2),
+        }
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+            self.conn.close()
+
+
+def _source_digest(filter_key):
+    digest = hashlib.sha1(repr((BAR_STORE_VERSION, filter_key)).encode())
+    with open(BAR_BUILDER_FILE, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:10]
+
+
+def _day_ns(date):
+    return pd.Timestamp(str(date)).value
+
+
+def _encode(df, date):
+    # Bar frame -> on-disk columns, or None if the day does not fit them
+    if df.empty:
+        return None
+    offset_ns = df.index.values.astype("datetime64[ns]").view("int64") - _day_ns(date)
+    volume = df["volume"].to_numpy()
+    prices = df[["open", "high", "low", "close"]].to_numpy()
+    if (offset_ns % NS_PER_SECOND).any() or np.abs(prices).max() >= MAX_PRICE:
+        return None
+    if (volume != np.round(volume)).any() or volume.min() < 0 or volume.max() >= 2**32:
+        return None
+    encoded = {"time": (offset_ns // NS_PER_SECOND).astype(BAR_COLUMNS["time"]),
+               "volume": volume.astype(BAR_COLUMNS["volume"])}
+    for name in ("open", "high", "low", "close"):
+        encoded[name] = df[name].to_numpy().astype(BAR_COLUMNS[name])
+    return encoded
+
+
+def _decode(columns, rows):
+    # Row ranges of the mapped columns -> bar arrays (one pass per column)
+    parts = {name: [] for name in BAR_COLUMNS}
+    for date, start, n in rows:
+        parts["time"].append(columns["time"][start:start + n].astype("int64") * NS_PER_SECOND + _day_ns(date))
+        for name in ("open", "high", "low", "close", "volume"):
+            parts[name].append(columns[name][start:start + n])
+    bars = {"time": np.concatenate(parts["time"])}
+    for name in ("open", "high", "low", "close"):
+        bars[name] = np.concatenate(parts[name]).astype("float64").round(2)
+    bars["volume"] = np.concatenate(parts["volume"]).astype("float64")
+    return bars
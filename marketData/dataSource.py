@@ -0,0 +1,127 @@
+import os
+import uuid
+import numpy as np
+
+from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS, request_trades
+from marketData.asyncFetch import AsyncFetchSource, FETCH_DEADLINE_SEC, FETCH_RETRIES
+from marketData.sessionPool import SessionPool
+from marketData.tickBuffer import TickBuffer
+from marketData.rangeFetch import split_buffer_by_day
+
+# A data source hands fetch_trades the raw trades of one ticker/date as a
+# filled TickBuffer (time in UTC epoch ns, price, size, excluded flag), or
+# None when there is nothing to serve; failed downloads raise:
+#   fetch_buffer(ticker, date) -> TickBuffer | None
+#   close()
+# Sources that can download several days in one request also have
+#   fetch_range(ticker, start, end) -> {day: TickBuffer} (days with trades)
+
+DATA_SOURCES = ("shel", "replay")
+
+
+class ShelDataSource:
+    # Live trades from the SHEL Data Gateway over pooled sessions. Blocking
+    # and without a deadline of its own; AsyncFetchSource adds those.
+
+    def __init__(self, session_pool):
+        self.session_pool = session_pool
+
+    def fetch_buffer(self, ticker, date, attempt=None):
+        with self.session_pool.session() as session:
+            if attempt is not None:
+                attempt.attach(session)
+            return request_trades(session, ticker, date)
+
+    def fetch_range(self, ticker, start, end, attempt=None):
+        with self.session_pool.session() as session:
+            if attempt is not None:
+                attempt.attach(session)
+            buffer = request_trades(session, ticker, start, end)
+        return split_buffer_by_day(buffer, start, end)
+
+    def close(self):
+        if self.session_pool is not None:
+            self.session_pool.close()
+
+
+class RecordingDataSource:
+    # Passes another source through and saves every day it serves to
+    # record_dir, in the format ReplayDataSource reads back
+
+    def __init__(self, source, record_dir):
+        self.source = source
+        self.record_dir = record_dir
+        os.makedirs(record_dir, exist_ok=True)
+
+    def fetch_buffer(self, ticker, date):
+        buffer = self.source.fetch_buffer(ticker, date)
+        if buffer is not None:
+            try:
+                write_recording(self.record_dir, ticker, date, buffer)
+            except OSError as e:
+                print(f"Could not record ticks for {ticker} on {date}: {e}")
+        return buffer
+
+    def fetch_range(self, ticker, start, end):
+        days = self.source.fetch_range(ticker, start, end)
+        for day, buffer in days.items():
+            try:
+                write_recording(self.record_dir, ticker, day, buffer)
+            except OSError as e:
+                print(f"Could not record ticks for {ticker} on {day}: {e}")
+        return days
+
+    def close(self):
+        self.source.close()
+
+
+class ReplayDataSource:
+    # Serves recorded days from record_dir without touching the network
+
+    def __init__(self, record_dir):
+        self.record_dir = record_dir
+
+    def fetch_buffer(self, ticker, date, attempt=None):
+        path = recording_path(self.record_dir, ticker, date)
+        if not os.path.exists(path):
+            print(f"No recorded ticks for {ticker} on {date} in {self.record_dir}")
+            return None
+        with np.load(path) as data:
+            if str(data["filter_key"]) != repr((EXCLUDED_FLAGS, EXCLUDED_MARKETS)):
+                print(f"Recording {path} was made with other excluded flags/markets, skipping")
+                return None
+            arrays = {name: data[name] for name in ("time", "price", "size", "excluded")}
+        return TickBuffer.from_arrays(arrays, EXCLUDED_FLAGS, EXCLUDED_MARKETS)
+
+    def close(self):
+        pass
+
+
+def recording_path(record_dir, ticker, date):
+    safe_ticker = str(ticker).replace("/", "-").replace(os.sep, "-")
+    return os.path.join(record_dir, f"{safe_ticker}_{date}.npz")
+
+
+def write_recording(record_dir, ticker, date, buffer):
+    # Raw columns before any filtering, so a replay goes through the same
+    # exclusion, time conversion and de-duplication as a live fetch
+    arrays = buffer.arrays()
+    path = recording_path(record_dir, ticker, date)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, filter_key=np.array(repr((EXCLUDED_FLAGS, EXCLUDED_MARKETS))), **arrays)
+    os.replace(tmp_path, path)
+
+
+def open_data_source(kind="shel", record_dir=None, workers=4, deadline=FETCH_DEADLINE_SEC, retries=FETCH_RETRIES):
+    # "shel": live gateway (deadlines, retries, at most `workers` requests in
+    # flight), recorded to record_dir when one is given
+    # "replay": recorded days from record_dir only
+    if kind == "replay":
+        if not record_dir:
+            raise ValueError("Replaying needs a record_dir with recorded ticks")
+        return ReplayDataSource(record_dir)
+    if kind == "shel":
+        source = AsyncFetchSource(ShelDataSource(SessionPool(workers)), workers, deadline, retries)
+        return RecordingDataSource(source, record_dir) if record_dir else source
+    raise ValueError(f"Unknown data source '{kind}', expected one of {DATA_SOURCES}")
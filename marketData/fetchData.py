@@ -1,128 +1,239 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import sheldatagateway
-from sheldatagateway import environments
 import sys
 import os
 import concurrent.futures
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from shelConfig import SHEL_USERNAME, SHEL_PASSWORD
-from sheldatagateway.core import AuthenticationError
+from marketData.tickBuffer import TickBuffer
+from marketData.sessionPool import abort_session
+from marketData.barBuilder import build_bars, build_bars_multi, bars_to_frame, interval_to_timedelta
+from runMetrics import METRICS
+
+# Off-market prints dropped before bar building (also part of the cache key)
+EXCLUDED_FLAGS = ('Drk',)
+EXCLUDED_MARKETS = ('FINN',)
+
+# Print tick counts, buffer size and peak RSS after every SHEL download
+REPORT_INGEST_MEMORY = False
 
-# Print settings (optional for console output)
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-pd.set_option('display.width', None)
-pd.set_option('display.max_colwidth', None)
+# Deadline for one standalone download (the pipeline uses asyncFetch settings)
+FETCH_TIMEOUT_SEC = 10
 
 
 
-def fetch_intraday_bars(ticker, date, interval='15min'):
-    trades = []
+def fetch_intraday_bars(ticker, date, interval='15min', cache=None, session_pool=None, data_source=None):
+    bars = fetch_intraday_bars_multi(ticker, date, [interval], cache=cache, session_pool=session_pool, data_source=data_source)
+    return bars.get(interval, pd.DataFrame())
 
+
+def fetch_intraday_bars_multi(ticker, date, intervals, cache=None, session_pool=None, data_source=None, keep_ticks=False,
+                              bar_store=None):
+    # One gateway pull per ticker/date, every interval built from the same ticks.
+    # With keep_ticks the cleaned tick arrays (or None) are also returned under
+    # the "ticks" key, for tick-level fills. A bar_store (marketData/barStore.py)
+    # answers for days it holds at every interval, and keeps completed days.
     if isinstance(date, str):
         date = datetime.strptime(date, "%Y-%m-%d").date()
 
-    #print(f"Starting fetch for {ticker} on {date} with interval {interval}")
-    try:
-        # Connect to SHEL Data Gateway
-        with sheldatagateway.Session(environments.env_defs.Prod, SHEL_USERNAME, SHEL_PASSWORD) as session:
-            #print("1")
-            def collect_trades(obj):
-                #print(obj)
-                #print("data started")
-                if obj['type'] == 'trade':
-                    ## TESTING LINE FOR OFF MARKET PRINTS
-                    if 'Drk' not in obj['flags'] and obj['mkt'] != 'FINN':
-                        trades.append(obj)
-
-            
-            handle = session.request_data(collect_trades, ticker, date, date, ['trade'])
-            
-
-
-            #handle.wait()
-            try:
-                run_with_timeout(handle.wait, 10)  # 10-second timeout
-            except TimeoutError as e:
-                print(f"SHEL data fetch timed out for {ticker} on {date}: {e}")
-                handle.cancel()
-                return pd.DataFrame()
-            
+    if bar_store is not None and not keep_ticks:
+        with METRICS.stage("bars.store_read"):
+            stored = {interval: bar_store.get(ticker, date, interval) for interval in intervals}
+        if all(arrays is not None for arrays in stored.values()):
+            return {interval: bars_to_frame(arrays) for interval, arrays in stored.items()}
+
+    ticks = fetch_trades(ticker, date, cache=cache, session_pool=session_pool, data_source=data_source)
+    if ticks is None:
+        bars = {interval: pd.DataFrame() for interval in intervals}
+    else:
+        with METRICS.stage("bars.build"):
+            bars = build_bars_multi(ticks, date, intervals)
+        if bar_store is not None and date < _today_eastern():
+            with METRICS.stage("bars.store_write"):
+                for interval in intervals:
+                    if not bar_store.put(ticker, date, interval, bars[interval]):
+                        METRICS.count("bars.store_skipped")
+    if keep_ticks:
+        bars["ticks"] = ticks
+    return bars
+
 
+def has_local_bars(ticker, date, intervals, cache=None, bar_store=None, keep_ticks=False):
+    # True when fetch_intraday_bars_multi can serve the day without downloading
+    if isinstance(date, str):
+        date = datetime.strptime(date, "%Y-%m-%d").date()
+    if bar_store is not None and not keep_ticks and all(bar_store.has(ticker, date, interval) for interval in intervals):
+        return True
+    return cache is not None and cache.has(ticker, date, (EXCLUDED_FLAGS, EXCLUDED_MARKETS))
 
 
+def fetch_trades(ticker, date, cache=None, session_pool=None, data_source=None):
+    # Returns {"time", "price", "size"} arrays (time as int64 ns, naive US/Eastern,
+    # sorted and de-duplicated) or None when there is nothing to build bars from.
+    # Raw trades come from data_source (see marketData/dataSource.py) or, if
+    # none is given, straight from SHEL.
+    if isinstance(date, str):
+        date = datetime.strptime(date, "%Y-%m-%d").date()
 
-            handle.raise_on_error()
+    filter_key = (EXCLUDED_FLAGS, EXCLUDED_MARKETS)
+    if cache is not None:
+        ticks = cache.get(ticker, date, filter_key)
+        if ticks is not None:
+            METRICS.count("fetch.cache_hits")
+            return ticks
 
-    except AuthenticationError as e:
-        print("Authentication failed: Invalid SHEL username or password.")
-        return pd.DataFrame()
+    # Wall time here is gateway/replay latency per ticker/date
+    with METRICS.stage("fetch.download", latency=True):
+        if data_source is not None:
+            buffer = data_source.fetch_buffer(ticker, date)
+        else:
+            buffer = download_trades(ticker, date, session_pool=session_pool)
+    ticks = buffer_to_ticks(buffer, ticker, date) if buffer is not None else None
 
-    except Exception as e:
-        print(f"Unexpected error during SHEL connection: {e}")
-        return pd.DataFrame()
+    # Completed trading days never change, so only those are cached
+    if cache is not None and ticks is not None and date < _today_eastern():
+        cache.put(ticker, date, filter_key, ticks)
+
+    return ticks
+
+
+def _today_eastern():
+    return pd.Timestamp.now(tz='US/Eastern').date()
 
-    if not trades:
-        print(f"No trades found for {ticker} on {date}")
-        return pd.DataFrame()
-    
-    #print("data finished handling")
-
-    # Convert to DataFrame and adjust time
-    df = pd.DataFrame(trades)
-    df['time'] = pd.to_datetime(df['time'] / 1e9, unit='s')
-    df['time'] = df['time'].dt.tz_localize('UTC').dt.tz_convert('US/Eastern')
-    df['time'] = df['time'].dt.tz_localize(None)
-    df.set_index('time', inplace=True)
-
-    # Remove any duplicate timestamps
-    df = df[~df.index.duplicated(keep='first')]
-
-    # Validate required columns
-    if df.empty or 'price' not in df.columns or 'size' not in df.columns:
-        print(f"Data invalid or missing required columns for {ticker} on {date}")
-        return pd.DataFrame()
-
-    # Create time range from 04:00 to 20:00 for the specified date
-    start_time = pd.Timestamp(f"{date} 04:00:00")
-    end_time = pd.Timestamp(f"{date} 20:00:00")
-    full_index = pd.date_range(start=start_time, end=end_time, freq='1min')
-    
-    # Reindex to ensure full minute coverage
-    df = df.reindex(df.index.union(full_index))
 
+def _open_session(session_pool=None):
+    # Pooled sessions are reused across fetches; otherwise log in for this one
+    if session_pool is not None:
+        return session_pool.session()
+    return _single_session()
 
+
+def is_auth_error(error):
+    # sheldatagateway is only imported once a session is opened, so a
+    # gateway error can only exist if the module is already loaded
+    core = sys.modules.get("sheldatagateway.core")
+    return core is not None and isinstance(error, core.AuthenticationError)
+
+
+@contextmanager
+def _single_session():
+    # The gateway package is imported here, on first use, so runs that never
+    # talk to SHEL (replay, cache hits, dry runs) do not pay for it
+    try:
+        import sheldatagateway
+        from sheldatagateway import environments
+    except ImportError:  # replay-only installs without the gateway package
+        raise ImportError("sheldatagateway is not installed (replay recorded ticks instead)")
+    from shelConfig import SHEL_USERNAME, SHEL_PASSWORD
+    session = sheldatagateway.Session(environments.env_defs.Prod, SHEL_USERNAME, SHEL_PASSWORD)
+    try:
+        yield session
+    except BaseException:
+        # Session.__exit__ would wait for a hung request; tear the socket down
+        abort_session(session)
+        raise
+    session.__exit__(None, None, None)
+
+
+def request_trades(session, ticker, date, end_date=None):
+    # Blocking: one day (or date..end_date) of trades on an open session into
+    # a TickBuffer. Off-market prints are marked on the way in and dropped by
+    # buffer_to_ticks with one array mask. Raises on gateway errors.
+    buffer = TickBuffer(EXCLUDED_FLAGS, EXCLUDED_MARKETS)
+    handle = session.request_data(buffer.collect, ticker, date, end_date or date, ['trade'])
+    handle.wait()
+    handle.raise_on_error()
+    return buffer
+
+
+def download_trades(ticker, date, session_pool=None):
+    # Standalone download with a hard FETCH_TIMEOUT_SEC deadline. Returns the
+    # filled TickBuffer, or None if the download failed (already printed).
     try:
-        bars = df.resample(interval).agg({
-            'price': ['first', 'max', 'min', 'last'],
-            'size': 'sum'
-        })
+        with _open_session(session_pool) as session:
+            try:
+                return run_with_timeout(request_trades, FETCH_TIMEOUT_SEC, session, ticker, date)
+            except TimeoutError as e:
+                print(f"SHEL data fetch timed out for {ticker} on {date}: {e}")
+                METRICS.count("fetch.timeouts")
+                # Raised inside the session block so its socket is torn down,
+                # which also releases the thread still blocked in handle.wait()
+                raise
+
+    except TimeoutError:
+        return None
+
     except Exception as e:
-        print(f"Error during resampling: {e}")
-        return pd.DataFrame()
+        if is_auth_error(e):
+            print("Authentication failed: Invalid SHEL username or password.")
+            METRICS.count("fetch.auth_failures")
+            return None
+        print(f"Unexpected error during SHEL connection: {e}")
+        METRICS.count("fetch.errors")
+        return None
+
+
+def buffer_to_ticks(buffer, ticker, date):
+    # Filled TickBuffer -> cleaned tick arrays (or None if nothing is left)
+    raw = buffer.arrays()
+    keep = ~raw["excluded"]
+    n_kept = int(np.count_nonzero(keep))
+    METRICS.count("ticks.received", len(buffer))
+    METRICS.count("ticks.dropped_off_market", len(buffer) - n_kept)
+    if not n_kept:
+        print(f"No trades found for {ticker} on {date}")
+        METRICS.count("fetch.empty_days")
+        return None
 
-    bars.columns = ['open', 'high', 'low', 'close', 'volume']
-    bars[['open', 'high', 'low', 'close']] = bars[['open', 'high', 'low', 'close']].round(2)
-    bars = bars.dropna()
+    with METRICS.stage("ingest.clean"):
+        ticks = _clean_ticks(raw["time"][keep], raw["price"][keep], raw["size"][keep])
+    METRICS.count("ticks.duplicates_removed", n_kept - len(ticks["time"]))
+    METRICS.count("ticks.kept", len(ticks["time"]))
 
-    #print(df.columns)
-    #print(df.head())
-    #print(df.index) 
+    if REPORT_INGEST_MEMORY:
+        print(f"{ticker} {date}: {len(buffer)} ticks received, {len(ticks['time'])} kept, "
+              f"buffers {buffer.nbytes() / 1e6:.1f} MB, peak RSS {_peak_rss_mb():.1f} MB")
 
-    ### IF you want to print out the data, uncomment line below this 
-    #print(bars)
-    #print("\n")
+    return ticks
+
+
+def _clean_ticks(epoch_ns, price, size):
+    # Same float-seconds conversion as the old DataFrame path, so timestamps
+    # (and therefore duplicates and bar edges) are unchanged
+    times = pd.to_datetime(epoch_ns / 1e9, unit='s').tz_localize('UTC').tz_convert('US/Eastern').tz_localize(None)
+    times = times.values.astype('datetime64[ns]').view('int64')
+
+    # Remove any duplicate timestamps (first print wins), sorted by time
+    times, first = np.unique(times, return_index=True)
+    return {"time": times, "price": price[first], "size": size[first]}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
 
-    return bars
 
 #fetch_intraday_bars("TSLA", "2024-06-05", interval='15min')
 
 def run_with_timeout(func, timeout, *args, **kwargs):
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(func, *args, **kwargs)
-        try:
-            return future.result(timeout=timeout)
-        except concurrent.futures.TimeoutError:
-            raise TimeoutError("Function timed out")
\ No newline at end of file
+    # Not a `with` block: leaving one joins the worker thread, which made the
+    # timeout wait for the hung call anyway. The caller unblocks the thread
+    # (e.g. by aborting the session) after a TimeoutError.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise TimeoutError("Function timed out")
+    finally:
+        executor.shutdown(wait=False)
\ No newline at end of file
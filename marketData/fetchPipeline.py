@@ -0,0 +1,65 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from marketData.fetchData import fetch_intraday_bars_multi, has_local_bars
+from marketData.dataSource import open_data_source
+from marketData.rangeFetch import RangeFetchSource, plan_fetch_ranges
+
+
+def iter_fetched_bars(jobs, intervals, workers=4, prefetch=None, cache=None, data_source=None, keep_ticks=False,
+                      bar_store=None, range_days=1):
+    # jobs: iterable of (key, ticker, date). Yields (key, bars_by_interval, error)
+    # in the same order as jobs, while up to `prefetch` later ticker/dates are
+    # already being fetched in the background. Without a data_source the
+    # trades come from SHEL through a source owned by this call. keep_ticks
+    # also returns the ticks and bar_store serves/keeps built bars (see
+    # fetch_intraday_bars_multi). With range_days > 1, nearby days of a ticker
+    # that are not stored locally are downloaded together (see rangeFetch.py).
+    prefetch = prefetch or workers * 2
+    own_source = data_source is None
+    if own_source:
+        data_source = open_data_source("shel", workers=workers)
+    fetch_source = data_source
+    if range_days > 1 and hasattr(data_source, "fetch_range"):
+        jobs = list(jobs)
+        ranges = plan_fetch_ranges(jobs, range_days, skip=lambda ticker, day: has_local_bars(
+            ticker, day, intervals, cache=cache, bar_store=bar_store, keep_ticks=keep_ticks))
+        fetch_source = RangeFetchSource(data_source, ranges)
+    pending = deque()
+    in_flight = {}
+
+    def submit(executor, job):
+        key, ticker, date = job
+        # Same ticker/date already queued (duplicate trade-list rows): share it
+        future = in_flight.get((ticker, date))
+        if future is None:
+            future = executor.submit(fetch_intraday_bars_multi, ticker, date, intervals,
+                                     cache=cache, data_source=fetch_source, keep_ticks=keep_ticks, bar_store=bar_store)
+            in_flight[(ticker, date)] = future
+        pending.append((key, ticker, date, future))
+
+    jobs = iter(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in jobs:
+                submit(executor, job)
+                if len(pending) >= prefetch:
+                    break
+
+            while pending:
+                key, ticker, date, future = pending.popleft()
+                try:
+                    bars_by_interval, error = future.result(), None
+                except Exception as e:
+                    bars_by_interval, error = None, e
+                if not any(item[3] is future for item in pending):
+                    in_flight.pop((ticker, date), None)
+
+                next_job = next(jobs, None)
+                if next_job is not None:
+                    submit(executor, next_job)
+
+                yield key, bars_by_interval, error
+    finally:
+        if own_source:
+            data_source.close()
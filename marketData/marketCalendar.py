@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday,
+                                    sunday_to_monday)
+
+# Weekdays the US stock market (NYSE/Nasdaq) is closed, for np.busday_count
+# and friends: the regular holiday rules plus the one-off closures since 2001.
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        # A Saturday New Year's Day is not moved to the Friday before
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas Day", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+# September 11, Presidents Reagan, Ford, G. H. W. Bush and Carter, Hurricane Sandy
+SPECIAL_CLOSURES = ["2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14", "2004-06-11", "2007-01-02",
+                    "2012-10-29", "2012-10-30", "2018-12-05", "2025-01-09"]
+
+
+def market_holidays(start, end):
+    # Weekday market closures in [start, end] -> sorted datetime64[D] array
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    holidays = NYSEHolidayCalendar().holidays(start, end)
+    special = pd.DatetimeIndex(SPECIAL_CLOSURES)
+    holidays = holidays.union(special[(special >= start) & (special <= end)])
+    holidays = holidays[holidays.dayofweek < 5]
+    return np.asarray(holidays.values.astype("datetime64[D]"))
@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import Future
+from datetime import date as Date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from marketData.tickBuffer import TickBuffer
+from runMetrics import METRICS
+
+# Trade-list jobs planned together; days of one range are held in memory
+# until their job is fetched, so this bounds how long that can take
+RANGE_PLAN_WINDOW = 256
+
+
+def plan_fetch_ranges(jobs, max_days, window=RANGE_PLAN_WINDOW, skip=None):
+    # jobs: (key, ticker, date) in fetch order -> [(ticker, start, end, days)]
+    # Days of a ticker are merged into one request when only weekends lie
+    # between them (so nothing unrequested is downloaded) and the request
+    # spans at most max_days calendar days. Days for which skip(ticker, day)
+    # is true (already cached) and single days are left out.
+    ranges = []
+    planned = set()
+    for offset in range(0, len(jobs), window):
+        days_by_ticker = {}
+        for _, ticker, date in jobs[offset:offset + window]:
+            day = _as_date(date)
+            if (ticker, day) in planned or (skip is not None and skip(ticker, day)):
+                continue
+            days_by_ticker.setdefault(ticker, set()).add(day)
+
+        for ticker, days in days_by_ticker.items():
+            group = []
+            for day in sorted(days):
+                if group and (day - group[0]).days < max_days and not np.busday_count(group[-1] + timedelta(days=1), day):
+                    group.append(day)
+                    continue
+                if len(group) > 1:
+                    ranges.append((ticker, group[0], group[-1], group))
+                group = [day]
+            if len(group) > 1:
+                ranges.append((ticker, group[0], group[-1], group))
+        planned.update((ticker, day) for ticker, _, _, days in ranges for day in days)
+    return ranges
+
+
+def split_buffer_by_day(buffer, start, end):
+    # Trades of a start..end request -> {day: TickBuffer} per US/Eastern
+    # calendar day that has trades, each holding exactly what a one-day
+    # request for that day returns (same order, excluded prints still marked)
+    raw = buffer.arrays()
+    n_days = (end - start).days + 1
+    midnights = np.array([pd.Timestamp(start + timedelta(days=k), tz="US/Eastern").value for k in range(n_days + 1)])
+    day_index = np.searchsorted(midnights, raw["time"], side="right") - 1
+    days = {}
+    for k in np.unique(day_index):
+        if 0 <= k < n_days:
+            mask = day_index == k
+            days[start + timedelta(days=int(k))] = TickBuffer.from_arrays(
+                {name: column[mask] for name, column in raw.items()}, buffer.excluded_flags, buffer.excluded_markets)
+    return days
+
+
+class RangeFetchSource:
+    # Data source serving the days of planned ranges (plan_fetch_ranges)
+    # from one fetch_range call per range; every other day goes to the
+    # wrapped source as before. The first day of a range to be asked for
+    # downloads it, the others wait for that download, and each day's
+    # buffer is dropped once it has been handed out. Closing is left to
+    # whoever owns the wrapped source.
+
+    def __init__(self, source, ranges):
+        self.source = source
+        self._lock = threading.Lock()
+        # (ticker, day) -> range; range -> [download, days not handed out yet]
+        self._range_of = {}
+        self._downloads = {}
+        for ticker, start, end, days in ranges:
+            for day in days:
+                self._range_of[(ticker, day)] = (ticker, start, end, len(days))
+
+    def fetch_buffer(self, ticker, date):
+        day = _as_date(date)
+        with self._lock:
+            planned = self._range_of.pop((ticker, day), None)
+            if planned is not None:
+                entry = self._downloads.get(planned)
+                owner = entry is None
+                if owner:
+                    entry = self._downloads[planned] = [Future(), planned[3]]
+        if planned is None:
+            return self.source.fetch_buffer(ticker, date)
+
+        ticker, start, end, n_days = planned
+        if owner:
+            METRICS.count("fetch.range_requests")
+            METRICS.count("fetch.range_days", n_days)
+            try:
+                entry[0].set_result(self.source.fetch_range(ticker, start, end))
+            except Exception as e:
+                entry[0].set_exception(e)
+        try:
+            days = entry[0].result()
+            with self._lock:
+                return days.pop(day, None)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._downloads[planned]
+
+    def close(self):
+        pass
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, Date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
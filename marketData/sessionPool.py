@@ -0,0 +1,104 @@
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+
+class SessionPool:
+    # Small pool of authenticated SHEL sessions shared by the fetch workers.
+    # Sessions are created lazily (each one logs in once) and reused; a session
+    # that raised or timed out is closed and replaced on the next acquire.
+
+    def __init__(self, size, session_factory=None):
+        self.size = size
+        self._session_factory = session_factory or _default_session_factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                break
+
+            # All sessions busy; wait for a release (or a discard freeing a slot)
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+        try:
+            session = self._session_factory()
+            session.__enter__()
+            return session
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, session):
+        self._idle.put(session)
+
+    def discard(self, session):
+        # A session that failed may still have a request in flight, and
+        # __exit__ would block waiting for it, so the socket is torn down
+        abort_session(session)
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def session(self):
+        session = self.acquire()
+        try:
+            yield session
+        except BaseException:
+            self.discard(session)
+            raise
+        self.release(session)
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            # Idle sessions have nothing outstanding and can log out cleanly
+            try:
+                session.__exit__(None, None, None)
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+
+
+def abort_session(session):
+    # Shut the socket down so a thread blocked in handle.wait() gets EOF and
+    # returns right away (closing alone does not wake a blocked recv)
+    client = getattr(session, "sock", None)
+    raw_socket = getattr(client, "sock", None)
+    if raw_socket is not None:
+        try:
+            raw_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+def _default_session_factory():
+    import sheldatagateway
+    from sheldatagateway import environments
+    from shelConfig import SHEL_USERNAME, SHEL_PASSWORD
+
+    return sheldatagateway.Session(environments.env_defs.Prod, SHEL_USERNAME, SHEL_PASSWORD)
@@ -0,0 +1,71 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+# Venues used for regular prints; FINN is the off-exchange venue fetchData drops
+VENUES = ("NSDQ", "NYSE", "ARCA", "BATS", "EDGX")
+
+
+def generate_trades(ticker, date, n_ticks=100_000, seed=None, dark_fraction=0.03, finn_fraction=0.01,
+                    duplicate_fraction=0.02, capitulation_drop=0.25, start_price=None):
+    # Deterministic SHEL-like trade columns for one capitulation-style day:
+    # a premarket grind up, a squeeze into the open, a sharp flush of about
+    # capitulation_drop from the high and a partial bounce into the close.
+    # Times are UTC epoch ns like the gateway sends them; a share of prints
+    # carry the Drk flag or the FINN venue, and some repeat the previous
+    # print's timestamp. Same ticker/date/seed always gives the same day.
+    if seed is None:
+        seed = zlib.crc32(f"{ticker}|{date}".encode())
+    rng = np.random.default_rng(seed)
+
+    session_start = pd.Timestamp(f"{date} 04:00", tz="US/Eastern").value
+    session_end = pd.Timestamp(f"{date} 20:00", tz="US/Eastern").value
+    session_ns = session_end - session_start
+
+    # Most prints cluster around the open and the flush, the rest spread out
+    busy_start = pd.Timestamp(f"{date} 09:30", tz="US/Eastern").value
+    busy_ns = 90 * 60 * 1_000_000_000
+    n_busy = int(n_ticks * 0.6)
+    times = np.concatenate((
+        busy_start + rng.integers(0, busy_ns, n_busy),
+        session_start + rng.integers(0, session_ns, n_ticks - n_busy),
+    ))
+    times.sort()
+
+    duplicates = np.flatnonzero(rng.random(n_ticks) < duplicate_fraction)
+    duplicates = duplicates[duplicates > 0]
+    times[duplicates] = times[duplicates - 1]
+
+    # Price shape over the session (fraction of day -> multiple of the open)
+    if start_price is None:
+        start_price = float(np.round(rng.uniform(5, 300), 2))
+    day_fraction = (times - session_start) / session_ns
+    shape_x = [0.0, 0.34, 0.36, 0.40, 0.45, 0.60, 1.0]
+    peak = 1.0 + rng.uniform(0.15, 0.6)
+    low = peak * (1.0 - capitulation_drop)
+    shape_y = [1.0, 1.05, peak, peak * 0.97, low, low + (peak - low) * 0.4, low + (peak - low) * 0.3]
+    path = np.interp(day_fraction, shape_x, shape_y)
+
+    noise = np.cumsum(rng.normal(0.0, 0.0004, n_ticks))
+    noise -= np.interp(day_fraction, [0.0, 1.0], [0.0, noise[-1]])
+    price = np.round(start_price * path * (1.0 + noise), 2)
+    price = np.maximum(price, 0.01)
+
+    size = rng.choice([1, 10, 50, 100, 100, 100, 200, 500, 1000], n_ticks).astype(np.float64)
+
+    flags = np.empty(n_ticks, dtype=object)
+    flags[:] = [[] for _ in range(n_ticks)]
+    for i in np.flatnonzero(rng.random(n_ticks) < dark_fraction):
+        flags[i] = ["Drk"]
+
+    mkt = np.array(VENUES, dtype=object)[rng.integers(0, len(VENUES), n_ticks)]
+    mkt[rng.random(n_ticks) < finn_fraction] = "FINN"
+
+    return {"time": times, "price": price, "size": size, "flags": flags, "mkt": mkt}
+
+
+def iter_trade_messages(trades, symbol=""):
+    # Yields the dicts a SHEL request_data callback receives
+    for time, price, size, flags, mkt in zip(trades["time"].tolist(), trades["price"].tolist(),
+                                             trades["size"].tolist(), trades["flags"], trades["mkt"]):
+        yield {"type": "trade", "sym": symbol, "time": time, "price": price, "size": size, "flags": flags, "mkt": mkt}
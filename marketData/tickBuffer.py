@@ -0,0 +1,52 @@
+from array import array
+import numpy as np
+
+
+class TickBuffer:
+    # Growable typed columns for streamed SHEL trades. Only time/price/size are
+    # kept (plus one byte marking off-market prints), instead of every dict.
+
+    __slots__ = ("time", "price", "size", "excluded", "excluded_flags", "excluded_markets")
+
+    def __init__(self, excluded_flags=(), excluded_markets=()):
+        self.time = array("q")
+        self.price = array("d")
+        self.size = array("d")
+        self.excluded = array("b")
+        self.excluded_flags = excluded_flags
+        self.excluded_markets = excluded_markets
+
+    @classmethod
+    def from_arrays(cls, arrays, excluded_flags=(), excluded_markets=()):
+        # Refill from the columns arrays() hands out (e.g. a recorded day)
+        buffer = cls(excluded_flags, excluded_markets)
+        buffer.time.frombytes(np.ascontiguousarray(arrays["time"], dtype=np.int64).tobytes())
+        buffer.price.frombytes(np.ascontiguousarray(arrays["price"], dtype=np.float64).tobytes())
+        buffer.size.frombytes(np.ascontiguousarray(arrays["size"], dtype=np.float64).tobytes())
+        buffer.excluded.frombytes(np.ascontiguousarray(arrays["excluded"], dtype=np.int8).tobytes())
+        return buffer
+
+    def __len__(self):
+        return len(self.time)
+
+    def collect(self, obj):
+        # SHEL request_data callback
+        if obj['type'] != 'trade':
+            return
+        flags = obj['flags']
+        self.time.append(obj['time'])
+        self.price.append(obj['price'])
+        self.size.append(obj['size'])
+        self.excluded.append(obj['mkt'] in self.excluded_markets or any(flag in flags for flag in self.excluded_flags))
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in (self.time, self.price, self.size, self.excluded))
+
+    def arrays(self):
+        # Zero-copy NumPy views over the buffers
+        return {
+            "time": np.frombuffer(self.time, dtype=np.int64),
+            "price": np.frombuffer(self.price, dtype=np.float64),
+            "size": np.frombuffer(self.size, dtype=np.float64),
+            "excluded": np.frombuffer(self.excluded, dtype=np.int8).view(bool),
+        }
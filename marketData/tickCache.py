@@ -0,0 +1,108 @@
+import os
+import hashlib
+import threading
+import numpy as np
+
+
+# Bumped whenever the stored tick layout changes, so old files are not reused
+CACHE_VERSION = 2
+
+
+class TickCache:
+    # Local store of filtered tick arrays, one .npz file per ticker/date/filter.
+    # Least recently used files are evicted once the directory exceeds max_mb.
+
+    def __init__(self, cache_dir, max_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # path -> [size, last used]
+        self._entries = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith(".npz"):
+                path = os.path.join(cache_dir, name)
+                stat = os.stat(path)
+                self._entries[path] = [stat.st_size, stat.st_mtime]
+
+    def _path(self, ticker, date, filter_key):
+        digest = hashlib.sha1(repr((CACHE_VERSION, filter_key)).encode()).hexdigest()[:10]
+        safe_ticker = str(ticker).replace("/", "-").replace(os.sep, "-")
+        return os.path.join(self.cache_dir, f"{safe_ticker}_{date}_{digest}.npz")
+
+    def has(self, ticker, date, filter_key):
+        with self._lock:
+            return self._path(ticker, date, filter_key) in self._entries
+
+    def get(self, ticker, date, filter_key):
+        path = self._path(ticker, date, filter_key)
+        with self._lock:
+            cached = path in self._entries
+            if not cached:
+                self.misses += 1
+        if not cached:
+            return None
+        try:
+            with np.load(path) as data:
+                ticks = {"time": data["time"], "price": data["price"], "size": data["size"]}
+        except Exception as e:
+            print(f"Discarding unreadable cache file {path}: {e}")
+            with self._lock:
+                self._remove(path)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if path in self._entries:
+                os.utime(path)
+                self._entries[path][1] = os.stat(path).st_mtime
+            self.hits += 1
+        return ticks
+
+    def put(self, ticker, date, filter_key, ticks):
+        path = self._path(ticker, date, filter_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, time=ticks["time"], price=ticks["price"], size=ticks["size"])
+        with self._lock:
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+            self._entries[path] = [stat.st_size, stat.st_mtime]
+            self._evict()
+
+    def _remove(self, path):
+        self._entries.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "files": len(self._entries),
+            "size_mb": round(sum(size for size, _ in self._entries.values()) / (1024 * 1024), 2),
+        }
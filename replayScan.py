@@ -0,0 +1,106 @@
+import os
+import sys
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import userConfig
+
+# Bar-by-bar replay of trade-list days through the incremental strategies
+# (backtester/liveStrategy.py), as a live scan would have seen them:
+#   python3 replayScan.py                          all days of TRADE_LIST_FILE on the first interval
+#   python3 replayScan.py --interval 1min --speed 600 --events
+# Bars come from the tick cache / bar store / SHEL like a backtest run
+# (userConfig.py settings). Events print as they happen with --events and
+# every ticker/date ends with its P&L per strategy.
+
+
+def load_units(trade_list_file, interval, fill_mode="bar"):
+    # -> {(ticker, date): bar arrays} of the trade list's valid ticker/dates
+    from backtester.analyze import bars_to_arrays
+    from backtester.batchBacktest import read_trade_list
+    from marketData.barStore import BarStore
+    from marketData.dataSource import open_data_source
+    from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS
+    from marketData.fetchPipeline import iter_fetched_bars
+    from marketData.tickCache import TickCache
+
+    if fill_mode != "bar":
+        print(f"Note: replays fill at bar prices, FILL_MODE '{fill_mode}' is ignored")
+    trades = read_trade_list(trade_list_file)
+    jobs = []
+    seen = set()
+    for idx, ticker, date in zip(trades.index, trades["Ticker"], trades["Date"]):
+        if isinstance(date, str) and (ticker, date) not in seen:
+            seen.add((ticker, date))
+            jobs.append((idx, ticker, date))
+
+    cache = TickCache(userConfig.CACHE_DIR, userConfig.CACHE_MAX_MB) if userConfig.CACHE_DIR else None
+    bar_store = BarStore(userConfig.BAR_STORE_DIR, (EXCLUDED_FLAGS, EXCLUDED_MARKETS)) if userConfig.BAR_STORE_DIR else None
+    source = open_data_source(userConfig.DATA_SOURCE, userConfig.RECORD_DIR, userConfig.FETCH_WORKERS,
+                              userConfig.FETCH_DEADLINE_SEC, userConfig.FETCH_RETRIES)
+    units = {}
+    try:
+        for idx, bars_by_interval, error in iter_fetched_bars(jobs, [interval], workers=userConfig.FETCH_WORKERS,
+                                                              cache=cache, data_source=source, bar_store=bar_store,
+                                                              range_days=userConfig.FETCH_RANGE_DAYS):
+            ticker, date = trades.loc[idx, "Ticker"], trades.loc[idx, "Date"]
+            if error is not None:
+                print(f"Skipping {ticker} on {date}: {error}")
+                continue
+            df = bars_by_interval[interval]
+            if df.empty:
+                print(f"Skipping {ticker} on {date}: no bars")
+                continue
+            units[(ticker, date)] = bars_to_arrays(df)
+    finally:
+        source.close()
+        if bar_store is not None:
+            bar_store.close()
+    return units
+
+
+def print_event(key, strategy, event):
+    time, name, price, stop, pnl, _, _ = event
+    ticker, date = key
+    detail = f"P&L {pnl:.2f}" if pnl is not None else f"stop {stop:.2f}"
+    if name == "TRAIL":
+        detail = f"stop {price:.2f} -> {stop:.2f}"
+    print(f"[{pd.Timestamp(time)}] {ticker:<6} {strategy:<30} {name:<8} @ {price:.2f} | {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bar-by-bar replay of trade-list days through the live strategies")
+    parser.add_argument("--trade-list-file", default=userConfig.TRADE_LIST_FILE)
+    parser.add_argument("--interval", default=userConfig.INTERVALS_TO_TEST[0])
+    parser.add_argument("--strategies", nargs="+", default=userConfig.STRATEGIES)
+    parser.add_argument("--start-time", default=userConfig.START_TIME)
+    parser.add_argument("--end-time", default=userConfig.END_TIME)
+    parser.add_argument("--speed", type=float, help="multiple of real time to replay at (default: as fast as possible)")
+    parser.add_argument("--events", action="store_true", help="print entries, trails and exits as they happen")
+    args = parser.parse_args(argv)
+
+    from backtester.liveStrategy import live_strategy_params, replay_bars
+    from backtester.strategies import check_strategies
+    try:
+        for name in check_strategies(args.strategies):
+            live_strategy_params(name)
+    except ValueError as e:
+        print(f"Cannot replay: {e}")
+        return 2
+
+    units = load_units(args.trade_list_file, args.interval, userConfig.FILL_MODE)
+    print(f"Replaying {len(units)} ticker/dates on {args.interval} bars"
+          + (f" at {args.speed:g}x real time" if args.speed else ""))
+    results = replay_bars(units, args.strategies, args.start_time, args.end_time, speed=args.speed,
+                          on_event=print_event if args.events else None)
+
+    for (ticker, date), by_strategy in results.items():
+        summary = ", ".join(f"{name} {stats['pnl']:.2f} ({stats['total_trades']} trades)"
+                            for name, stats in by_strategy.items())
+        print(f"{ticker} {date}: {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
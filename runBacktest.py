@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import userConfig
+
+# Command-line entry point for the backtest, the streamed backtest and the
+# parameter sweep:
+#   python3 runBacktest.py                              run with userConfig.py as is
+#   python3 runBacktest.py --config nightly.json        override settings from a JSON file
+#   python3 runBacktest.py --intervals-to-test 5min 15min --no-write-trade-logs
+#   python3 runBacktest.py --dry-run                    check settings and trade list, fetch nothing
+# Every setting of userConfig.py is a flag (INTERVALS_TO_TEST -> --intervals-to-test)
+# and a key of the config file; flags win over the file, the file over
+# userConfig.py. Modules are imported by the stage that needs them: --help
+# loads nothing heavy, and a run only loads the runner it uses.
+
+# Settings whose type cannot be taken from their userConfig.py default
+OPTION_TYPES = {
+    "FETCH_DEADLINE_SEC": float,
+    "BOOTSTRAP_SEED": int,
+}
+
+# Output formats write_workbook / write_table_sinks know
+EXPORT_FORMATS = ("xlsx", "csv", "parquet")
+
+
+def config_defaults():
+    return {name: value for name, value in vars(userConfig).items()
+            if name.isupper() and isinstance(value, (str, int, float, bool, list, dict, type(None)))}
+
+
+def _text(value):
+    # "none" turns off path settings such as --cache-dir
+    return None if value.lower() == "none" else value
+
+
+def _optional(convert):
+    def parse(value):
+        return None if value.lower() == "none" else convert(value)
+    parse.__name__ = convert.__name__
+    return parse
+
+
+def build_parser(defaults):
+    parser = argparse.ArgumentParser(description="Capitulation short backtest (settings default to userConfig.py)")
+    parser.add_argument("--config", help="JSON file of userConfig.py settings, e.g. {\"INTERVALS_TO_TEST\": [\"5min\"]}")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="validate the settings and trade list and show what a run would fetch, without running it")
+    for name, default in defaults.items():
+        flag = "--" + name.lower().replace("_", "-")
+        kwargs = {"dest": name, "default": argparse.SUPPRESS, "help": f"default: {default!r}"}
+        if isinstance(default, bool):
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction, **kwargs)
+        elif isinstance(default, list):
+            parser.add_argument(flag, nargs="+", **kwargs)
+        elif isinstance(default, dict):
+            parser.add_argument(flag, type=json.loads, metavar="JSON", **kwargs)
+        elif name in OPTION_TYPES:
+            parser.add_argument(flag, type=_optional(OPTION_TYPES[name]), **kwargs)
+        elif isinstance(default, (int, float)):
+            parser.add_argument(flag, type=type(default), **kwargs)
+        else:
+            parser.add_argument(flag, type=_text, **kwargs)
+    return parser
+
+
+def load_config(args, defaults):
+    # userConfig.py, then the config file, then the flags given
+    config = dict(defaults)
+    options = vars(args)
+    if options.get("config"):
+        with open(options["config"]) as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(defaults))
+        if unknown:
+            raise ValueError(f"Unknown settings in {options['config']}: {unknown}")
+        config.update(overrides)
+    config.update({name: value for name, value in options.items() if name in defaults})
+    return config
+
+
+def validate(config):
+    # -> list of problems; the checks only import what they look at
+    problems = []
+    from marketData.barBuilder import interval_to_timedelta
+    for interval in config["INTERVALS_TO_TEST"]:
+        try:
+            interval_to_timedelta(interval)
+        except ValueError:
+            problems.append(f"Unknown interval '{interval}'")
+
+    from backtester.strategies import check_strategies
+    from backtester.analyze import FILL_MODES
+    try:
+        check_strategies(config["STRATEGIES"])
+    except ValueError as e:
+        problems.append(str(e))
+    if config["FILL_MODE"] not in FILL_MODES:
+        problems.append(f"Unknown fill mode '{config['FILL_MODE']}', expected one of {list(FILL_MODES)}")
+
+    unknown_formats = [fmt for fmt in config["EXPORT_FORMATS"] if fmt not in EXPORT_FORMATS]
+    if unknown_formats:
+        problems.append(f"Unknown export formats {unknown_formats}, expected some of {list(EXPORT_FORMATS)}")
+    if config["STREAM_TABLE_FORMAT"] not in ("csv", "parquet"):
+        problems.append(f"Unknown stream table format '{config['STREAM_TABLE_FORMAT']}', expected 'csv' or 'parquet'")
+    if config["DATA_SOURCE"] not in ("shel", "replay"):
+        problems.append(f"Unknown data source '{config['DATA_SOURCE']}', expected 'shel' or 'replay'")
+    elif config["DATA_SOURCE"] == "replay" and not (config["RECORD_DIR"] and os.path.isdir(config["RECORD_DIR"])):
+        problems.append(f"Replaying needs the recorded ticks in RECORD_DIR ({config['RECORD_DIR']!r} not found)")
+    if config["RUN_SWEEP"]:
+        from backtester.parameterSweep import expand_grid
+        try:
+            expand_grid(config["SWEEP_GRID"])
+        except ValueError as e:
+            problems.append(str(e))
+    if not os.path.isfile(config["TRADE_LIST_FILE"]):
+        problems.append(f"Trade list {config['TRADE_LIST_FILE']!r} not found")
+    return problems
+
+
+def dry_run(config):
+    # Reads the trade list (in chunks when streaming) and reports the units a
+    # run would compute, what is already stored locally and the SHEL requests
+    # left. Stores that do not exist yet are not created.
+    from backtester.tradeList import iter_trade_list
+    from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS, has_local_bars
+    from marketData.rangeFetch import plan_fetch_ranges
+
+    intervals = config["INTERVALS_TO_TEST"]
+    cache = bar_store = result_store = None
+    if config["CACHE_DIR"] and os.path.isdir(config["CACHE_DIR"]):
+        from marketData.tickCache import TickCache
+        cache = TickCache(config["CACHE_DIR"], config["CACHE_MAX_MB"])
+    if config["BAR_STORE_DIR"] and os.path.isdir(config["BAR_STORE_DIR"]):
+        from marketData.barStore import BarStore
+        bar_store = BarStore(config["BAR_STORE_DIR"], (EXCLUDED_FLAGS, EXCLUDED_MARKETS))
+    if config["RESULT_STORE"] and os.path.isfile(config["RESULT_STORE"]) and not config["RUN_SWEEP"]:
+        from backtester.batchBacktest import strategy_store_params
+        from backtester.resultStore import ResultStore
+        result_store = ResultStore(config["RESULT_STORE"], strategy_store_params(
+            config["START_TIME"], config["END_TIME"], config["FILL_MODE"]), config["STRATEGIES"])
+
+    rows = invalid = stored_units = local_days = 0
+    seen = set()
+    jobs = []
+    for chunk in iter_trade_list(config["TRADE_LIST_FILE"], config["STREAM_CHUNK_ROWS"]):
+        rows += len(chunk)
+        for idx, ticker, date in zip(chunk.index, chunk["Ticker"], chunk["Date"]):
+            if not isinstance(date, str):
+                invalid += 1
+                continue
+            if (ticker, date) in seen:
+                continue
+            seen.add((ticker, date))
+            if result_store is not None:
+                stored = sum(result_store.has(ticker, date, interval) for interval in intervals)
+                stored_units += stored
+                if stored == len(intervals):
+                    continue
+            if has_local_bars(ticker, date, intervals, cache=cache, bar_store=bar_store,
+                              keep_ticks=config["FILL_MODE"] == "tick"):
+                local_days += 1
+                continue
+            jobs.append((idx, ticker, date))
+    if result_store is not None:
+        result_store.close()
+    if bar_store is not None:
+        bar_store.close()
+
+    ranges = plan_fetch_ranges(jobs, config["FETCH_RANGE_DAYS"]) if config["FETCH_RANGE_DAYS"] > 1 else []
+    requests = len(jobs) - sum(len(days) for _, _, _, days in ranges) + len(ranges)
+    mode = "parameter sweep" if config["RUN_SWEEP"] else "streamed backtest" if config["STREAM_TRADE_LIST"] else "backtest"
+    print(f"Dry run ({mode}): {rows} trade-list rows, {invalid} with invalid dates, {len(seen)} ticker/dates "
+          f"x {len(intervals)} intervals = {len(seen) * len(intervals)} units")
+    print(f"  already stored: {stored_units} units in the result store, {local_days} days in the tick cache/bar store")
+    print(f"  to download: {len(jobs)} days in {requests} SHEL requests ({config['DATA_SOURCE']})")
+
+
+def run(config):
+    # Imports only the runner that is used
+    common = {
+        "intervals": config["INTERVALS_TO_TEST"],
+        "cache_dir": config["CACHE_DIR"],
+        "cache_max_mb": config["CACHE_MAX_MB"],
+        "bar_store_dir": config["BAR_STORE_DIR"],
+        "fetch_workers": config["FETCH_WORKERS"],
+        "fetch_deadline": config["FETCH_DEADLINE_SEC"],
+        "fetch_retries": config["FETCH_RETRIES"],
+        "fetch_range_days": config["FETCH_RANGE_DAYS"],
+        "data_source": config["DATA_SOURCE"],
+        "record_dir": config["RECORD_DIR"],
+        "write_run_report": config["WRITE_RUN_REPORT"],
+        "strategies": config["STRATEGIES"],
+        "fill_mode": config["FILL_MODE"],
+    }
+    if config["RUN_SWEEP"]:
+        from backtester.parameterSweep import run_parameter_sweep
+        run_parameter_sweep(excel_path=config["TRADE_LIST_FILE"], param_grid=config["SWEEP_GRID"],
+                            output_path=config["SWEEP_OUTPUT_FILE"], **common)
+        return
+
+    common.update({
+        "start_time": config["START_TIME"],
+        "end_time": config["END_TIME"],
+        "output_path": config["OUTPUT_FILE"],
+        "backtest_workers": config["BACKTEST_WORKERS"],
+        "result_store": config["RESULT_STORE"],
+    })
+    if config["STREAM_TRADE_LIST"]:
+        from backtester.streamingBacktest import backtest_trade_stream
+        backtest_trade_stream(trade_list_path=config["TRADE_LIST_FILE"], chunk_rows=config["STREAM_CHUNK_ROWS"],
+                              table_format=config["STREAM_TABLE_FORMAT"], **common)
+    else:
+        from backtester.batchBacktest import backtest_multiple_trades
+        backtest_multiple_trades(excel_path=config["TRADE_LIST_FILE"], write_trade_logs=config["WRITE_TRADE_LOGS"],
+                                 export_formats=config["EXPORT_FORMATS"], bootstrap_draws=config["BOOTSTRAP_DRAWS"],
+                                 bootstrap_seed=config["BOOTSTRAP_SEED"], **common)
+
+
+def main(argv=None):
+    defaults = config_defaults()
+    args = build_parser(defaults).parse_args(argv)
+    try:
+        config = load_config(args, defaults)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read config: {e}")
+        return 2
+
+    problems = validate(config)
+    for problem in problems:
+        print(f"Config error: {problem}")
+    if problems:
+        return 2
+    if args.dry_run:
+        dry_run(config)
+        return 0
+    run(config)
+    return 0
+
+
+# Guarded so backtest worker processes can re-import this file without starting a run
+if __name__ == "__main__":
+    sys.exit(main())
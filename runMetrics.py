@@ -0,0 +1,100 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+# Upper edges (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class RunMetrics:
+    # Process-wide stage timers, counters and latency samples for one run.
+    # Every update is a few additions under a lock, so it stays on in
+    # production; report() does the percentile/histogram work once at the end.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}     # name -> [calls, wall seconds, cpu seconds]
+            self.counters = {}
+            self.latencies = {}  # name -> [seconds, ...]
+
+    @contextmanager
+    def stage(self, name, latency=False):
+        # CPU time is the calling thread's, so concurrent fetch threads do not
+        # count each other's work
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.thread_time() - cpu, latency=latency)
+
+    def add_time(self, name, wall, cpu=0.0, latency=False):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+            if latency:
+                self.latencies.setdefault(name, []).append(wall)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def report(self):
+        with self._lock:
+            stages = {name: {"calls": calls, "wall_sec": round(wall, 4), "cpu_sec": round(cpu, 4)}
+                      for name, (calls, wall, cpu) in self.stages.items()}
+            counters = dict(self.counters)
+            latencies = {name: list(samples) for name, samples in self.latencies.items()}
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_sec": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": counters,
+            "latency_ms": {name: latency_histogram(samples) for name, samples in latencies.items()},
+        }
+
+    def write_json(self, path, **extra):
+        report = self.report()
+        report.update(extra)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=_json_default)
+        return report
+
+
+def latency_histogram(samples):
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if len(ms) == 0:
+        return {"count": 0}
+    counts = np.bincount(np.searchsorted(LATENCY_BUCKETS_MS, ms, side="left"), minlength=len(LATENCY_BUCKETS_MS) + 1)
+    labels = [f"<={edge}" for edge in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "count": int(len(ms)),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(ms.max()), 3),
+        "buckets": {label: int(n) for label, n in zip(labels, counts) if n},
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+METRICS = RunMetrics()
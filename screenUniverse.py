@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import userConfig
+
+# Screens every ticker/date in the bar store (BAR_STORE_DIR) for capitulation
+# days and writes them as a ranked trade list for the backtest:
+#   python3 screenUniverse.py --output-file screened.xlsx
+#   python3 screenUniverse.py --start-date 2023-01-01 --min-drop 0.15 --caps-file caps.csv --max-candidates 500
+# Then point TRADE_LIST_FILE (or runBacktest.py --trade-list-file) at it.
+# Only days already in the bar store are screened; backtest runs with
+# BAR_STORE_DIR set fill it.
+
+
+def main(argv=None):
+    from backtester.screener import MIN_DROP_FROM_HIGH, MIN_PRICE, MIN_VOLUME_SURGE
+
+    parser = argparse.ArgumentParser(description="Screen the bar store for capitulation days and write a trade list")
+    parser.add_argument("--bar-store-dir", default=userConfig.BAR_STORE_DIR)
+    parser.add_argument("--interval", default=userConfig.INTERVALS_TO_TEST[0], help="stored bar interval to screen")
+    parser.add_argument("--output-file", default="screenedTradeList.xlsx", help=".xlsx or .csv trade list to write")
+    parser.add_argument("--tickers-file", help="header-less file of tickers to screen (default: every stored ticker)")
+    parser.add_argument("--caps-file", help="header-less Ticker, Cap file for the Cap column")
+    parser.add_argument("--start-date")
+    parser.add_argument("--end-date")
+    parser.add_argument("--min-drop", type=float, default=MIN_DROP_FROM_HIGH, help="drop from the running high of day")
+    parser.add_argument("--min-volume-surge", type=float, default=MIN_VOLUME_SURGE,
+                        help="day volume over its average of the prior stored days")
+    parser.add_argument("--min-price", type=float, default=MIN_PRICE)
+    parser.add_argument("--max-candidates", type=int)
+    args = parser.parse_args(argv)
+
+    if not (args.bar_store_dir and os.path.isdir(args.bar_store_dir)):
+        print(f"No bar store at {args.bar_store_dir!r}; set BAR_STORE_DIR or --bar-store-dir")
+        return 2
+
+    import pandas as pd
+    from backtester.screener import read_caps, screen_universe, write_screened_trade_list
+    from marketData.barStore import BarStore
+    from marketData.fetchData import EXCLUDED_FLAGS, EXCLUDED_MARKETS
+
+    tickers = None
+    if args.tickers_file:
+        tickers = pd.read_csv(args.tickers_file, header=None, usecols=[0], dtype=str)[0].str.strip().tolist()
+    caps = read_caps(args.caps_file) if args.caps_file else None
+
+    started = time.perf_counter()
+    bar_store = BarStore(args.bar_store_dir, (EXCLUDED_FLAGS, EXCLUDED_MARKETS))
+    try:
+        days, candidates = screen_universe(bar_store, args.interval, tickers, args.start_date, args.end_date,
+                                           min_drop=args.min_drop, min_volume_surge=args.min_volume_surge,
+                                           min_price=args.min_price, caps=caps, max_candidates=args.max_candidates)
+    finally:
+        bar_store.close()
+
+    print(f"Screened {days['Ticker'].nunique()} tickers, {len(days)} days in {time.perf_counter() - started:.1f}s: "
+          f"{len(candidates)} candidates")
+    if candidates.empty:
+        print("No day passed the filters; no trade list written")
+        return 0
+    features_path = write_screened_trade_list(candidates, args.output_file)
+    print(f"Trade list saved to '{args.output_file}', ranked features to '{features_path}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
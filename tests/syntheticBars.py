@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic bar days shared by the tests
+
+
+def random_bars(seed, freq="5min", gap_fraction=0.15, drift=0.0, date="2024-06-03"):
+    # A 04:00-20:00 day of random-walk bars with some bars missing (gaps),
+    # plus a bar before and after the session that must be ignored
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(f"{date} 03:50", f"{date} 20:10", freq=freq)
+    index = index[rng.random(len(index)) >= gap_fraction]
+    steps = rng.normal(drift, 0.006, len(index))
+    close = np.round(20 * np.exp(np.cumsum(steps)), 2)
+    open_ = np.round(np.r_[20, close[:-1]], 2)
+    high = np.round(np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, len(index))), 2)
+    low = np.round(np.minimum(open_, close) * (1 - rng.uniform(0, 0.004, len(index))), 2)
+    volume = rng.integers(100, 10_000, len(index)).astype(float)
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=index)
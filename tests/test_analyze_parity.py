@@ -0,0 +1,75 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backtester.analyze import (TRADE_EVENT_COLUMNS, bars_to_arrays, run_capitulation_short_strategy_arrays,
+                                run_capitulation_short_strategy_with_metrics)
+from syntheticBars import random_bars
+
+# The array engine must give the same stats and trade events as the original
+# bar-by-bar pandas strategy on any day of bars.
+
+STATS_FIELDS = ("pnl", "EV", "win_rate", "avg_risk_reward", "total_trades", "wins", "losses", "max_pnl", "min_pnl",
+                "total_percent_return", "avg_percent_return", "ev_risk")
+
+
+def rising_bars(freq="5min"):
+    # Every bar makes a higher low: no bar ever breaks the prior low, so no entry
+    index = pd.date_range("2024-06-03 04:00", "2024-06-03 20:00", freq=freq)
+    low = np.round(10 + 0.01 * np.arange(len(index)), 2)
+    return pd.DataFrame({"open": low + 0.02, "high": low + 0.05, "low": low, "close": low + 0.03,
+                         "volume": np.full(len(index), 1000.0)}, index=index)
+
+
+def edge_entry_bars(entry_time):
+    # Flat bars except one that breaks the prior low exactly at entry_time
+    index = pd.date_range("2024-06-03 04:00", "2024-06-03 20:00", freq="5min")
+    df = pd.DataFrame({"open": 10.02, "high": 10.05, "low": 10.0, "close": 10.03, "volume": 1000.0}, index=index)
+    df.loc[pd.Timestamp(f"2024-06-03 {entry_time}"), ["low", "close"]] = [9.5, 9.6]
+    return df
+
+
+def assert_same(df, start_time="09:30", end_time="16:00", **params):
+    expected = run_capitulation_short_strategy_with_metrics(df.copy(), start_time, end_time, **params)
+    actual = run_capitulation_short_strategy_arrays(bars_to_arrays(df), start_time, end_time, **params)
+    for field in STATS_FIELDS:
+        assert actual[field] == expected[field], field
+    for column in TRADE_EVENT_COLUMNS:
+        assert actual["events"][column] == expected["events"][column], column
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(45))
+def test_random_days_match(seed):
+    freq = ("1min", "5min", "15min")[seed % 3]
+    assert_same(random_bars(seed, freq, drift=(-0.0005, 0.0, 0.0005)[seed // 3 % 3]))
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.01, 0.05, 1.0])
+def test_capitulation_threshold_matches(threshold):
+    for seed in range(10):
+        assert_same(random_bars(seed), capitulation_threshold=threshold)
+
+
+@pytest.mark.parametrize("window", [("09:30", "16:00"), ("09:35", "09:35"), ("04:00", "20:00"), ("19:00", "19:30")])
+def test_entry_windows_match(window):
+    for seed in range(10):
+        assert_same(random_bars(seed), *window)
+
+
+def test_window_without_entries():
+    stats = assert_same(rising_bars())
+    assert stats["total_trades"] == 0
+    # A window no bar falls in
+    assert assert_same(random_bars(1), "12:01", "12:04")["total_trades"] == 0
+
+
+@pytest.mark.parametrize("entry_time", ["09:30", "16:00", "09:25", "16:05"])
+def test_entries_at_window_edges(entry_time):
+    stats = assert_same(edge_entry_bars(entry_time))
+    # Both window bounds are inclusive
+    assert stats["total_trades"] == (1 if entry_time in ("09:30", "16:00") else 0)
@@ -0,0 +1,137 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import marketData.barStore as barStore
+from backtester.analyze import bars_to_arrays
+from marketData.barStore import BarStore
+from syntheticBars import random_bars
+
+# Bars read back from the store must be the bars that were put, as the
+# float64 arrays the bar builder makes; days the compact columns cannot
+# hold exactly are refused.
+
+FILTER_KEY = (("Z",), ("D",))
+DATES = ["2024-06-03", "2024-06-04", "2024-06-05"]
+
+
+def day_bars(date, seed=1, freq="5min"):
+    return random_bars(seed, freq, date=date)
+
+
+def assert_bars_equal(actual, expected):
+    assert set(actual) == set(expected)
+    for name, column in expected.items():
+        assert actual[name].dtype == column.dtype, name
+        np.testing.assert_array_equal(actual[name], column, err_msg=name)
+
+
+def test_round_trip(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    df = day_bars(DATES[0])
+    # Whole seconds anywhere in the day, up to its last second
+    df.index = df.index + pd.to_timedelta(np.arange(len(df)) % 60, unit="s")
+    df.loc[pd.Timestamp(f"{DATES[0]} 23:59:59")] = [12.34, 12.5, 12.01, 12.49, 4_294_967_295.0]
+    assert store.put("AAA", DATES[0], "5min", df)
+    assert store.has("AAA", DATES[0], "5min")
+    assert_bars_equal(store.get("AAA", DATES[0], "5min"), bars_to_arrays(df))
+    assert store.get("AAA", DATES[1], "5min") is None
+    store.close()
+
+    # Persisted, and only for the same tick filter
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    assert_bars_equal(store.get("AAA", DATES[0], "5min"), bars_to_arrays(df))
+    store.close()
+    other = BarStore(str(tmp_path), (("Z", "W"), ("D",)))
+    assert other.get("AAA", DATES[0], "5min") is None
+    other.close()
+
+
+def test_prices_read_back_rounded_to_cents(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    df = day_bars(DATES[0])
+    # Cent prices float32 cannot hold exactly, up to just below MAX_PRICE
+    df.iloc[:3, :4] = [[0.01, 0.07, 0.01, 0.03], [19.99, 20.01, 19.97, 20.0],
+                       [barStore.MAX_PRICE - 0.01, barStore.MAX_PRICE - 0.01, 65535.5, 65535.99]]
+    store.put("AAA", DATES[0], "5min", df)
+    bars = store.get("AAA", DATES[0], "5min")
+    for name in ("open", "high", "low", "close"):
+        assert bars[name].dtype == np.float64
+        np.testing.assert_array_equal(bars[name], df[name].to_numpy())
+    store.close()
+
+
+def test_days_that_do_not_fit_are_refused(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    too_much_volume = day_bars(DATES[0])
+    too_much_volume.iloc[5, 4] = 2.0**32
+    fractional_volume = day_bars(DATES[0])
+    fractional_volume.iloc[5, 4] = 10.5
+    negative_volume = day_bars(DATES[0])
+    negative_volume.iloc[5, 4] = -1.0
+    high_price = day_bars(DATES[0])
+    high_price.iloc[5, 1] = barStore.MAX_PRICE
+    sub_second = day_bars(DATES[0])
+    sub_second.index = sub_second.index + pd.Timedelta(milliseconds=500)
+    for n, df in enumerate([too_much_volume, fractional_volume, negative_volume, high_price, sub_second,
+                            day_bars(DATES[0]).iloc[:0]]):
+        assert not store.put(f"T{n}", DATES[0], "5min", df)
+        assert not store.has(f"T{n}", DATES[0], "5min")
+    assert store.tickers("5min") == []
+    store.close()
+
+
+def test_get_range_concatenates_days_in_date_order(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    days = {date: day_bars(date, seed=n) for n, date in enumerate(DATES)}
+    # Stored out of order, and one day twice (kept once)
+    for date in (DATES[2], DATES[0], DATES[1], DATES[0]):
+        assert store.put("AAA", date, "5min", days[date])
+    store.put("BBB", DATES[1], "5min", days[DATES[1]])
+
+    dates, bars = store.get_range("AAA", "5min", DATES[0], DATES[2])
+    assert dates == DATES
+    assert_bars_equal(bars, bars_to_arrays(pd.concat(days.values())))
+    dates, bars = store.get_range("AAA", "5min", DATES[1], "2024-12-31")
+    assert dates == DATES[1:]
+    assert_bars_equal(bars, bars_to_arrays(pd.concat([days[DATES[1]], days[DATES[2]]])))
+    assert store.get_range("AAA", "5min", "2024-07-01", "2024-07-31") == ([], None)
+    assert store.get_range("AAA", "15min", DATES[0], DATES[2]) == ([], None)
+    assert store.tickers("5min") == ["AAA", "BBB"]
+    store.close()
+
+
+def test_grown_files_are_remapped(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    store.put("AAA", DATES[0], "5min", day_bars(DATES[0]))
+    store.get("AAA", DATES[0], "5min")
+    store.put("AAA", DATES[1], "5min", day_bars(DATES[1], seed=2))
+    assert_bars_equal(store.get("AAA", DATES[1], "5min"), bars_to_arrays(day_bars(DATES[1], seed=2)))
+    store.close()
+
+
+def test_open_maps_are_bounded_and_released(tmp_path, monkeypatch):
+    monkeypatch.setattr(barStore, "MAX_OPEN_MAPS", 3)
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    tickers = [f"T{n}" for n in range(5)]
+    for n, ticker in enumerate(tickers):
+        store.put(ticker, DATES[0], "5min", day_bars(DATES[0], seed=n))
+    for ticker in tickers[:3]:
+        store.get(ticker, DATES[0], "5min")
+    # T0 is read again, so T1 is now the least recently used
+    store.get("T0", DATES[0], "5min")
+    for ticker in tickers[3:]:
+        store.get(ticker, DATES[0], "5min")
+    assert list(store._maps) == [("T0", "5min"), ("T3", "5min"), ("T4", "5min")]
+
+    store.release("T3", "5min")
+    store.release("T9", "5min")
+    assert list(store._maps) == [("T0", "5min"), ("T4", "5min")]
+    # Released and evicted tickers are mapped again on the next read
+    for n, ticker in enumerate(tickers):
+        assert_bars_equal(store.get(ticker, DATES[0], "5min"), bars_to_arrays(day_bars(DATES[0], seed=n)))
+    assert len(store._maps) == 3
+    store.close()
@@ -0,0 +1,65 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backtester.analyze import TRADE_EVENT_COLUMNS, bars_to_arrays
+from backtester.liveStrategy import live_strategy_params, replay_bars
+from backtester.strategies import STRATEGIES, register_strategy, run_strategies
+from syntheticBars import random_bars
+
+# The incremental strategies (liveStrategy.py) keep their own copy of the
+# trailing-stop rules; replaying bars one at a time must give exactly the
+# stats and trade events of the array engine for every registered strategy.
+
+
+def random_units(n_units, seed):
+    # {(ticker, date, interval): bar arrays} over several dates (so replays
+    # interleave units of the same day), intervals and drifts
+    units = {}
+    for k in range(n_units):
+        date = f"2024-06-0{3 + k % 3}"
+        freq = ("1min", "5min", "15min")[k % 3]
+        df = random_bars(seed * 1000 + k, freq, drift=(-0.0005, 0.0, 0.0005)[k // 3 % 3], date=date)
+        units[(f"T{k}", date, freq)] = bars_to_arrays(df)
+    return units
+
+
+def assert_same(expected, actual):
+    for field, value in expected.items():
+        if field == "events":
+            for column in TRADE_EVENT_COLUMNS:
+                assert actual["events"][column] == value[column], column
+        else:
+            assert actual[field] == value, field
+
+
+@pytest.mark.parametrize("threshold", [0.10, 0.02, 0.005])
+@pytest.mark.parametrize("window", [("09:30", "16:00"), ("04:00", "20:00"), ("10:00", "10:00")])
+def test_replay_matches_array_engine(threshold, window):
+    names = sorted(STRATEGIES)
+    units = random_units(12, seed=int(threshold * 1000))
+    replayed = replay_bars(units, names, *window, capitulation_threshold=threshold)
+    for key, bars in units.items():
+        expected = run_strategies(bars, names, *window, capitulation_threshold=threshold)
+        for name in names:
+            assert_same(expected[name], replayed[key][name])
+
+
+def test_events_are_reported_in_time_order():
+    units = random_units(6, seed=7)
+    seen = []
+    replay_bars(units, on_event=lambda key, name, event: seen.append((key, event)))
+    bar_events = [event[0] for _, event in seen if event[1] != "EOD_EXIT"]
+    assert bar_events == sorted(bar_events)
+    assert seen
+
+
+def test_strategies_without_incremental_version_are_rejected():
+    register_strategy("_test_custom", lambda features, start_time, end_time, **params: {})
+    try:
+        with pytest.raises(ValueError):
+            live_strategy_params("_test_custom")
+    finally:
+        del STRATEGIES["_test_custom"]
@@ -0,0 +1,146 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date as Date
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from marketData.dataSource import ShelDataSource
+from marketData.rangeFetch import plan_fetch_ranges, split_buffer_by_day
+from marketData.tickBuffer import TickBuffer
+
+# A multi-day request split by split_buffer_by_day must hand out exactly the
+# buffers one-day requests would, and the planner may only merge days whose
+# gaps are weekends, within its window of trade-list jobs.
+
+
+class FakeGatewaySession:
+    # Serves a fixed tape like SHEL's request_data: every trade (plus
+    # non-trade records) whose US/Eastern calendar day is in [start, end]
+    def __init__(self, tape):
+        self.tape = tape
+
+    def request_data(self, callback, ticker, start, end, types):
+        days = self.tape["day"]
+        wanted = (days >= pd.Timestamp(str(start)).date()) & (days <= pd.Timestamp(str(end)).date())
+        for record in self.tape[wanted].to_dict("records"):
+            callback({key: value for key, value in record.items() if key != "day"})
+        return self
+
+    def wait(self):
+        pass
+
+    def raise_on_error(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, tape):
+        self.tape = tape
+
+    @contextmanager
+    def session(self):
+        yield FakeGatewaySession(self.tape)
+
+    def close(self):
+        pass
+
+
+def make_tape(first_day, last_day, seed=0):
+    # Trades every few minutes of each weekday's 04:00-20:00 (local time, so
+    # the UTC offset changes across a DST switch), a few right at the
+    # Eastern midnights, excluded prints and quotes in between
+    rng = np.random.default_rng(seed)
+    times = []
+    for day in pd.bdate_range(first_day, last_day):
+        local = pd.date_range(day + pd.Timedelta("04:00:00"), day + pd.Timedelta("20:00:00"), freq="7min")
+        local = local.append(pd.DatetimeIndex([day, day + pd.Timedelta("23:59:59.999999999")]))
+        times.extend(local.tz_localize("US/Eastern"))
+    times = pd.DatetimeIndex(sorted(times))
+    n = len(times)
+    return pd.DataFrame({
+        "type": np.where(rng.random(n) < 0.1, "quote", "trade"),
+        "time": times.tz_convert("UTC").asi8,
+        "price": np.round(rng.uniform(5, 6, n), 2),
+        "size": rng.integers(1, 500, n).astype(float),
+        "mkt": np.where(rng.random(n) < 0.05, "FINN", "NSDQ"),
+        "flags": [("Drk",) if flag else () for flag in rng.random(n) < 0.05],
+        "day": times.tz_convert("US/Eastern").date,
+    })
+
+
+@pytest.mark.parametrize("start, end", [
+    (Date(2024, 3, 8), Date(2024, 3, 11)),    # Friday-Monday over the spring DST switch
+    (Date(2024, 3, 4), Date(2024, 3, 12)),    # a week and a weekend, DST switch inside
+    (Date(2024, 10, 31), Date(2024, 11, 4)),  # Thursday-Monday over the autumn switch
+    (Date(2024, 6, 3), Date(2024, 6, 3)),
+])
+def test_split_matches_one_day_requests(start, end):
+    source = ShelDataSource(FakePool(make_tape(start - pd.Timedelta(days=3), end + pd.Timedelta(days=3))))
+    days = source.fetch_range("AAA", start, end)
+    weekdays = [day.date() for day in pd.bdate_range(start, end)]
+    # Weekend days have no trades, so no buffer
+    assert sorted(days) == weekdays
+    for day in weekdays:
+        expected = source.fetch_buffer("AAA", day.strftime("%Y-%m-%d"))
+        actual = days[day]
+        assert isinstance(actual, TickBuffer)
+        assert (actual.excluded_flags, actual.excluded_markets) == (expected.excluded_flags, expected.excluded_markets)
+        assert len(actual) == len(expected) > 0
+        for name, column in expected.arrays().items():
+            np.testing.assert_array_equal(actual.arrays()[name], column, err_msg=f"{day} {name}")
+
+
+def test_split_of_empty_buffer():
+    assert split_buffer_by_day(TickBuffer(), Date(2024, 3, 8), Date(2024, 3, 11)) == {}
+
+
+def jobs_of(days, ticker="AAA"):
+    return [(k, ticker, day) for k, day in enumerate(days)]
+
+
+def test_planner_merges_over_weekends_only():
+    # Friday + Monday: only a weekend between
+    assert plan_fetch_ranges(jobs_of(["2024-03-08", "2024-03-11"]), 5) == [
+        ("AAA", Date(2024, 3, 8), Date(2024, 3, 11), [Date(2024, 3, 8), Date(2024, 3, 11)])]
+    # Monday + Wednesday would download the unrequested Tuesday
+    assert plan_fetch_ranges(jobs_of(["2024-03-04", "2024-03-06"]), 5) == []
+    # Thursday + Monday would download the Friday
+    assert plan_fetch_ranges(jobs_of(["2024-03-07", "2024-03-11"]), 5) == []
+
+
+def test_planner_respects_max_days():
+    week = ["2024-03-04", "2024-03-05", "2024-03-06", "2024-03-07", "2024-03-08"]
+    assert [(start, end) for _, start, end, _ in plan_fetch_ranges(jobs_of(week), 5)] == [
+        (Date(2024, 3, 4), Date(2024, 3, 8))]
+    # Three calendar days per request, and the leftover single day is left out
+    assert [(start, end) for _, start, end, _ in plan_fetch_ranges(jobs_of(week + ["2024-03-11"]), 3)] == [
+        (Date(2024, 3, 4), Date(2024, 3, 6)), (Date(2024, 3, 7), Date(2024, 3, 8))]
+    # Friday-Monday spans 4 calendar days
+    assert plan_fetch_ranges(jobs_of(["2024-03-08", "2024-03-11"]), 3) == []
+
+
+def test_planner_keeps_tickers_apart_and_skips_cached_days():
+    jobs = jobs_of(["2024-03-04", "2024-03-05"]) + [(9, "BBB", "2024-03-05"), (10, "BBB", "2024-03-06"),
+                                                    (11, "AAA", "2024-03-05")]
+    assert plan_fetch_ranges(jobs, 5) == [
+        ("AAA", Date(2024, 3, 4), Date(2024, 3, 5), [Date(2024, 3, 4), Date(2024, 3, 5)]),
+        ("BBB", Date(2024, 3, 5), Date(2024, 3, 6), [Date(2024, 3, 5), Date(2024, 3, 6)])]
+    cached = {("BBB", Date(2024, 3, 6))}
+    assert [ticker for ticker, _, _, _ in plan_fetch_ranges(jobs, 5, skip=lambda *key: key in cached)] == ["AAA"]
+
+
+def test_planner_window():
+    # Days of a ticker only merge when they are within one window of jobs
+    filler = [(k, f"F{k}", "2024-03-01") for k in range(1, 256)]
+    jobs = [(0, "AAA", "2024-03-04")] + filler + [(256, "AAA", "2024-03-05"), (257, "AAA", "2024-03-06")]
+    assert plan_fetch_ranges(jobs, 5) == [
+        ("AAA", Date(2024, 3, 5), Date(2024, 3, 6), [Date(2024, 3, 5), Date(2024, 3, 6)])]
+    assert plan_fetch_ranges(jobs, 5, window=512) == [
+        ("AAA", Date(2024, 3, 4), Date(2024, 3, 6), [Date(2024, 3, 4), Date(2024, 3, 5), Date(2024, 3, 6)])]
+    # A day planned in one window is not planned again in a later one
+    repeated = jobs_of(["2024-03-04", "2024-03-05"]) + filler[1:] + jobs_of(["2024-03-04", "2024-03-05"])
+    assert len(repeated) > 256
+    assert len(plan_fetch_ranges(repeated, 5)) == 1
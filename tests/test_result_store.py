@@ -0,0 +1,158 @@
+import os
+import sys
+import datetime
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import backtester.batchBacktest as batchBacktest
+import backtester.resultStore as resultStore
+from backtester.analyze import bars_to_arrays
+from backtester.resultStore import ResultStore
+from runMetrics import METRICS
+from syntheticBars import random_bars
+
+# The result store decides which units a run recomputes: stored complete
+# units are reused, a run that stops keeps every committed checkpoint,
+# today's units are redone and rows of other code versions or strategy
+# parameters never count.
+
+TODAY = "2024-06-05"
+TRADES = [("AAA", "2024-06-03"), ("BBB", "2024-06-03"), ("AAA", "2024-06-04"), ("CCC", "2024-06-04"),
+          ("BBB", "2024-06-05")]
+INTERVALS = ["5min", "15min"]
+PARAMS = {"start_time": "09:30", "end_time": "16:00"}
+
+
+class StopRun(Exception):
+    pass
+
+
+class FakeSource:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    # Serves random bars per ticker/date instead of SHEL and records the
+    # ticker/dates each run asks for; stop_after makes the fetch fail after
+    # that many days, like a run that is interrupted
+    calls = {"requested": [], "stop_after": None}
+
+    def iter_fetched_bars(jobs, intervals, **kwargs):
+        jobs = list(jobs)
+        calls["requested"].append([(ticker, date) for _, ticker, date in jobs])
+        for n, (idx, ticker, date) in enumerate(jobs):
+            if calls["stop_after"] is not None and n == calls["stop_after"]:
+                raise StopRun()
+            seed = sum(map(ord, ticker + date))
+            yield idx, {interval: random_bars(seed, interval, date=date) for interval in intervals}, None
+
+    monkeypatch.setattr(batchBacktest, "iter_fetched_bars", iter_fetched_bars)
+    monkeypatch.setattr(batchBacktest, "open_data_source", lambda *args, **kwargs: FakeSource())
+    monkeypatch.setattr(batchBacktest, "_today_eastern", lambda: datetime.date.fromisoformat(TODAY))
+    # Checkpoint after every ticker/date
+    monkeypatch.setattr(batchBacktest, "UNITS_PER_WORKER_BATCH", 1)
+    return calls
+
+
+def run_backtest(tmp_path, store_path):
+    trade_list = tmp_path / "trades.xlsx"
+    pd.DataFrame([(ticker, date, "A", "Large") for ticker, date in TRADES]).to_excel(trade_list, header=False,
+                                                                                      index=False)
+    batchBacktest.backtest_multiple_trades(str(trade_list), INTERVALS, PARAMS["start_time"], PARAMS["end_time"],
+                                           str(tmp_path / "out.xlsx"), export_formats=(), result_store=str(store_path),
+                                           write_run_report=False)
+    return dict(METRICS.counters)
+
+
+def stored_rows(store_path):
+    store = ResultStore(str(store_path), PARAMS)
+    try:
+        return {(ticker, date, interval): store.get(ticker, date, interval)[:2]
+                for ticker, date in TRADES for interval in INTERVALS}
+    finally:
+        store.close()
+
+
+def test_resume_after_interrupted_run(tmp_path, fake_fetch):
+    fake_fetch["stop_after"] = 3
+    with pytest.raises(StopRun):
+        run_backtest(tmp_path, tmp_path / "resumed.sqlite")
+
+    fake_fetch["stop_after"] = None
+    counters = run_backtest(tmp_path, tmp_path / "resumed.sqlite")
+    # Only the ticker/dates not checkpointed before the stop are fetched again
+    assert fake_fetch["requested"][-1] == TRADES[3:]
+    assert counters["units.reused"] == 3 * len(INTERVALS)
+    assert counters["units.computed"] == 2 * len(INTERVALS)
+
+    run_backtest(tmp_path, tmp_path / "full.sqlite")
+    assert stored_rows(tmp_path / "resumed.sqlite") == stored_rows(tmp_path / "full.sqlite")
+
+
+def test_todays_units_are_recomputed(tmp_path, fake_fetch):
+    run_backtest(tmp_path, tmp_path / "store.sqlite")
+    store = ResultStore(str(tmp_path / "store.sqlite"), PARAMS)
+    try:
+        # Kept for the report, but not complete
+        assert store.get("BBB", TODAY, "5min") is not None
+        assert not store.has("BBB", TODAY, "5min")
+        assert store.has("BBB", "2024-06-03", "5min")
+    finally:
+        store.close()
+
+    counters = run_backtest(tmp_path, tmp_path / "store.sqlite")
+    assert fake_fetch["requested"][-1] == [("BBB", TODAY)]
+    assert counters["units.computed"] == len(INTERVALS)
+    assert counters["units.reused"] == 4 * len(INTERVALS)
+
+
+def put_unit(store, ticker="AAA", date="2024-06-03", interval="5min"):
+    bars = bars_to_arrays(random_bars(1, interval, date=date))
+    store.put(ticker, date, interval, {"Ticker": ticker, "P&L": 1.5}, {"time": []}, bars)
+    store.commit()
+
+
+def test_rows_of_other_code_versions_are_dropped(tmp_path, monkeypatch):
+    path = str(tmp_path / "store.sqlite")
+    store = ResultStore(path, PARAMS)
+    put_unit(store)
+    store.close()
+
+    monkeypatch.setattr(resultStore, "code_version", lambda: "changed")
+    store = ResultStore(path, PARAMS)
+    try:
+        assert not store.has("AAA", "2024-06-03", "5min")
+        assert store.get("AAA", "2024-06-03", "5min") is None
+        assert store.conn.execute("SELECT COUNT(*) FROM units").fetchone()[0] == 0
+    finally:
+        store.close()
+
+
+def test_rows_of_other_parameters_are_ignored(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    store = ResultStore(path, PARAMS)
+    put_unit(store)
+    store.close()
+
+    for params, strategies in [({**PARAMS, "start_time": "10:00"}, None), ({**PARAMS, "fill_mode": "tick"}, None),
+                               (PARAMS, ["reversal_long"])]:
+        store = ResultStore(path, params, *([strategies] if strategies else []))
+        try:
+            assert not store.has("AAA", "2024-06-03", "5min")
+            assert store.get("AAA", "2024-06-03", "5min") is None
+        finally:
+            store.close()
+
+    # ... and stay stored for their own parameters
+    store = ResultStore(path, PARAMS)
+    try:
+        assert store.has("AAA", "2024-06-03", "5min")
+        result, _, df_raw = store.get("AAA", "2024-06-03", "5min")
+        assert result["P&L"] == 1.5
+        assert len(df_raw) == len(random_bars(1, "5min"))
+    finally:
+        store.close()
@@ -0,0 +1,159 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backtester.analyze import bars_to_arrays
+from backtester.screener import (FEATURE_COLUMNS, GRADES, VOLUME_LOOKBACK_DAYS, VOLUME_MIN_DAYS, daily_features,
+                                 rank_candidates, screen_universe)
+from marketData.barStore import BarStore
+from syntheticBars import random_bars
+
+# The screener's flat-array features must match a plain per-day pandas
+# computation for every ticker/date, across ticker boundaries, missing
+# days and market holidays.
+
+FILTER_KEY = (("Z",), ("D",))
+# Market holidays of the stored days (Good Friday, Independence Day)
+HOLIDAYS = {pd.Timestamp("2024-03-29"), pd.Timestamp("2024-07-04")}
+
+
+def trading_days(start, end, skip=()):
+    return [day for day in pd.bdate_range(start, end) if day not in HOLIDAYS and day.strftime("%Y-%m-%d") not in skip]
+
+
+UNIVERSE = {
+    # Over 20 days (lookback cap), a missing day (06-26) and July 4 inside
+    "AAA": trading_days("2024-06-03", "2024-07-12", skip=("2024-06-26",)),
+    # Fewer stored days than VOLUME_MIN_DAYS
+    "BBB": trading_days("2024-06-03", "2024-06-05"),
+    # Around Good Friday
+    "CCC": trading_days("2024-03-20", "2024-04-05"),
+}
+
+
+def ticker_frames(seed=0):
+    # {ticker: bar frame of all its days}, prices of each ticker on their own level
+    frames = {}
+    for k, (ticker, days) in enumerate(UNIVERSE.items()):
+        parts = [random_bars(seed * 100 + k * 50 + n, "5min", drift=-0.001 * (n % 4 == 0), date=day.strftime("%Y-%m-%d"))
+                 for n, day in enumerate(days)]
+        df = pd.concat(parts)
+        df[["open", "high", "low", "close"]] *= 1 + k
+        df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].round(2)
+        frames[ticker] = df
+    return frames
+
+
+def reference_days(frames):
+    # One row per ticker/date computed day by day with pandas
+    rows = []
+    for ticker, df in frames.items():
+        session = df.between_time("09:30", "15:59:59")
+        days = [(pd.Timestamp(date), g) for date, g in session.groupby(session.index.normalize())]
+        for i, (date, g) in enumerate(days):
+            running_high = g["high"].cummax()
+            prev_trading_day = date - pd.offsets.BDay(1)
+            while prev_trading_day in HOLIDAYS:
+                prev_trading_day -= pd.offsets.BDay(1)
+            prev_close = days[i - 1][1]["close"].iloc[-1] if i and days[i - 1][0] == prev_trading_day else np.nan
+            prior_volume = [prior["volume"].sum() for _, prior in days[max(0, i - VOLUME_LOOKBACK_DAYS):i]]
+            avg_volume = np.mean(prior_volume) if len(prior_volume) >= VOLUME_MIN_DAYS else np.nan
+            rows.append({
+                "Ticker": ticker, "Date": date, "open": g["open"].iloc[0], "high": g["high"].max(),
+                "low": g["low"].min(), "close": g["close"].iloc[-1], "volume": g["volume"].sum(),
+                "drop_from_high": ((running_high - g["low"]) / running_high).max(), "prev_close": prev_close,
+                "gap": g["open"].iloc[0] / prev_close - 1, "avg_volume": avg_volume,
+                "volume_surge": g["volume"].sum() / avg_volume,
+            })
+    return pd.DataFrame(rows)
+
+
+def assert_days_match(days, expected):
+    assert list(days["Ticker"]) == list(expected["Ticker"])
+    assert list(pd.to_datetime(days["Date"])) == list(expected["Date"])
+    for column in FEATURE_COLUMNS:
+        np.testing.assert_allclose(days[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-12, err_msg=column)
+
+
+def test_features_match_per_day_reference():
+    for seed in range(3):
+        frames = ticker_frames(seed)
+        days = daily_features([(ticker, bars_to_arrays(df)) for ticker, df in frames.items()])
+        assert_days_match(days, reference_days(frames))
+
+
+def test_gaps_across_holidays_and_missing_days():
+    days = daily_features([(ticker, bars_to_arrays(df)) for ticker, df in ticker_frames().items()])
+    prev_close = days.set_index(["Ticker", days["Date"].astype(str)])["prev_close"]
+    # The days after Independence Day and Good Friday gap from the day before the holiday
+    assert not np.isnan(prev_close["AAA", "2024-07-05"])
+    assert not np.isnan(prev_close["CCC", "2024-04-01"])
+    assert not np.isnan(prev_close["AAA", "2024-06-10"])
+    # After a missing trading day, and on each ticker's first day (not the previous ticker's last)
+    assert np.isnan(prev_close["AAA", "2024-06-27"])
+    assert np.isnan(prev_close["BBB", "2024-06-03"])
+    assert np.isnan(prev_close["CCC", "2024-03-20"])
+
+
+def test_volume_surge_needs_enough_prior_days():
+    days = daily_features([(ticker, bars_to_arrays(df)) for ticker, df in ticker_frames().items()])
+    aaa = days[days["Ticker"] == "AAA"]
+    assert aaa["avg_volume"].iloc[:VOLUME_MIN_DAYS].isna().all()
+    assert aaa["avg_volume"].iloc[VOLUME_MIN_DAYS:].notna().all()
+    assert days.loc[days["Ticker"] == "BBB", "volume_surge"].isna().all()
+    assert len(aaa) > VOLUME_LOOKBACK_DAYS + 1
+
+
+def test_days_without_session_bars():
+    out_of_session = random_bars(1, "5min").between_time("16:00", "20:10")
+    assert daily_features([]).empty
+    assert daily_features([("AAA", bars_to_arrays(out_of_session)), ("BBB", None)]).empty
+    assert list(daily_features([]).columns) == ["Ticker", "Date"] + FEATURE_COLUMNS
+
+
+def test_screen_universe_reads_the_bar_store(tmp_path):
+    frames = ticker_frames()
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    for ticker, df in frames.items():
+        for date, day in df.groupby(df.index.normalize()):
+            assert store.put(ticker, date.strftime("%Y-%m-%d"), "5min", day)
+    # Batches of two tickers: features do not depend on the batching
+    days, candidates = screen_universe(store, "5min", batch_size=2, min_drop=0.0, min_volume_surge=0.0, min_price=0.0)
+    assert_days_match(days, reference_days(frames))
+    assert len(candidates) == days["volume_surge"].notna().sum()
+    assert store._maps == {}
+
+    days, _ = screen_universe(store, "5min", tickers=["CCC"], start_date="2024-04-01", end_date="2024-04-03")
+    assert list(days["Date"].astype(str)) == ["2024-04-01", "2024-04-02", "2024-04-03"]
+    store.close()
+
+
+def test_empty_store(tmp_path):
+    store = BarStore(str(tmp_path), FILTER_KEY)
+    days, candidates = screen_universe(store, "5min")
+    assert days.empty and candidates.empty
+    assert list(days.columns) == ["Ticker", "Date"] + FEATURE_COLUMNS
+    store.close()
+
+
+def test_rank_candidates():
+    days = pd.DataFrame({
+        "Ticker": ["A", "B", "C", "D", "E", "F", "G"],
+        "Date": pd.to_datetime(["2024-06-03"] * 7),
+        "close": [10.0, 10.0, 10.0, 10.0, 0.5, 10.0, 10.0],
+        "drop_from_high": [0.30, 0.20, 0.15, 0.12, 0.40, 0.05, 0.25],
+        "volume_surge": [5.0, 3.0, 2.5, 2.0, 9.0, 9.0, np.nan],
+        "gap": [-0.10, -0.05, np.nan, -0.02, -0.2, -0.2, -0.2],
+    })
+    candidates = rank_candidates(days, caps={"A": "Large"})
+    # E is below MIN_PRICE, F drops too little, G has no volume surge yet
+    assert list(candidates["Ticker"]) == ["A", "B", "C", "D"]
+    assert list(candidates["Grade"]) == [GRADES[0], GRADES[0], GRADES[1], GRADES[2]]
+    assert list(candidates["Cap"]) == ["Large", "Unknown", "Unknown", "Unknown"]
+    assert candidates["score"].is_monotonic_decreasing
+    assert list(rank_candidates(days, max_candidates=2)["Grade"]) == [GRADES[0], GRADES[1]]
+    assert rank_candidates(days.iloc[:0]).empty
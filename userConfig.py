@@ -14,23 +14,112 @@ INTERVALS_TO_TEST = ["10min", "15min", "30min"]
 START_TIME = "09:00"
 END_TIME = "16:00"
 
+# Strategies run on the same bars of every unit (see backtester/strategies.py):
+# "capitulation_short", "capitulation_short_fixed_stop", "reversal_long",
+# "reversal_long_fixed_stop". With more than one, Trade Results gets a
+# Strategy column and a Strategy Comparison sheet puts them side by side;
+# the other sheets describe the first one
+STRATEGIES = ["capitulation_short"]
+
+# How entries and stops fill: "bar" uses bar prices (entry at the prior bar's
+# low, stop exactly at the stop price); "tick" keeps each day's trades and
+# fills at the first trade through the level, so the order of entry and stop
+# inside a bar is resolved and gaps through the stop are paid
+FILL_MODE = "bar"
+
 # Path to Excel file with tickers and dates
 TRADE_LIST_FILE = "tradeList.xlsx"
 
 # Output Excel file
 OUTPUT_FILE = "all_capitulation_results.xlsx"
 
-# === END CONFIGURATION === #
+# Local tick cache (completed days are reused instead of re-downloaded)
+# Set CACHE_DIR = None to always fetch from SHEL
+CACHE_DIR = "tickCache"
+CACHE_MAX_MB = 2048
+
+# Compact store of built bars (24 bytes per bar, memory-mapped) for keeping
+# years of bars across many tickers; stored days are read back without
+# fetching or rebuilding them. Set BAR_STORE_DIR = None to disable
+BAR_STORE_DIR = None
+
+# Where trades come from: "shel" (live gateway) or "replay" (files in RECORD_DIR,
+# no network or credentials needed). With RECORD_DIR set (e.g. "tickRecordings"),
+# live runs also record every downloaded day there so it can be replayed later.
+# Recordings are kept until deleted (no size cap, unlike CACHE_DIR), so this
+# is off by default
+DATA_SOURCE = "shel"
+RECORD_DIR = None
+
+# Number of ticker/dates fetched from SHEL in parallel (one pooled session each)
+FETCH_WORKERS = 4
+
+# Each SHEL download gets FETCH_DEADLINE_SEC seconds before it is aborted;
+# timeouts and connection errors are retried FETCH_RETRIES times with backoff
+FETCH_DEADLINE_SEC = 10
+FETCH_RETRIES = 2
+
+# Days of the same ticker with only weekends between them are downloaded in
+# one SHEL request spanning up to FETCH_RANGE_DAYS calendar days and split
+# back into days locally (1 = one request per ticker/date)
+FETCH_RANGE_DAYS = 5
+
+# Number of processes running the strategy (1 = run in this process).
+# Bars reach the worker processes through a shared memory-mapped block.
+BACKTEST_WORKERS = 1
 
+# Finished units are stored here so re-runs only compute new or changed
+# ticker/date/interval units and an interrupted run resumes where it stopped.
+# Set RESULT_STORE = None to recompute everything every run
+RESULT_STORE = "backtestResults.sqlite"
+
+# Write the per-trade log column on the Raw Data sheet (turn off for very large runs)
+WRITE_TRADE_LOGS = True
+
+# Write <OUTPUT_FILE name>_run_report.json with stage timings, tick/fetch
+# counters and latency histograms for the run
+WRITE_RUN_REPORT = True
+
+# Bootstrap the closed trades BOOTSTRAP_DRAWS times for a Bootstrap sheet with
+# confidence intervals of EV and win rate, drawdown percentiles and risk of
+# ruin (overall and per interval, grade and cap). 0 skips it; set
+# BOOTSTRAP_SEED to a number to make the draws repeatable
+BOOTSTRAP_DRAWS = 0
+BOOTSTRAP_SEED = None
+
+# Output formats: "xlsx" (the workbook above), plus optional "csv" and/or "parquet"
+# files with the raw bars and trade results written next to OUTPUT_FILE
+EXPORT_FORMATS = ["xlsx"]
+
+# Streaming mode for very large trade lists (CSV, Parquet or xlsx): set
+# STREAM_TRADE_LIST = True to read TRADE_LIST_FILE STREAM_CHUNK_ROWS rows at a
+# time and append every result, raw bar and trade event to
+# STREAM_TABLE_FORMAT ("csv" or "parquet") files next to OUTPUT_FILE as the
+# run goes. OUTPUT_FILE then only holds the summary sheets; memory stays flat
+# however long the list is
+STREAM_TRADE_LIST = False
+STREAM_CHUNK_ROWS = 5000
+STREAM_TABLE_FORMAT = "csv"
+
+# Parameter sweep: set RUN_SWEEP = True to evaluate every combination below
+# (for each interval in INTERVALS_TO_TEST and strategy in STRATEGIES, with
+# FILL_MODE fills) instead of the single backtest.
+# Bars are fetched and built once per ticker/date and shared by all combinations.
+RUN_SWEEP = False
+SWEEP_GRID = {
+    "start_time": ["09:00", "09:30"],
+    "end_time": ["16:00"],
+    "capitulation_threshold": [0.05, 0.10, 0.15],
+}
+SWEEP_OUTPUT_FILE = "parameter_sweep_results.xlsx"
+
+# === END CONFIGURATION === #
 
-# Now just run the backtest!
-from backtester.batchBacktest import backtest_multiple_trades
-from shelConfig import SHEL_USERNAME, SHEL_PASSWORD
 
-backtest_multiple_trades(
-    excel_path=TRADE_LIST_FILE,
-    intervals=INTERVALS_TO_TEST,
-    start_time=START_TIME,
-    end_time=END_TIME,
-    output_path=OUTPUT_FILE
-)
+# Now just run the backtest! (runBacktest.py does the same, with flags to
+# override any setting above; see python3 runBacktest.py --help)
+# Guarded so backtest worker processes can re-import this file without starting a run
+if __name__ == "__main__":
+    import sys
+    from runBacktest import main
+    sys.exit(main([]))